@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Dict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
 import json
 
 @dataclass
@@ -14,25 +14,85 @@ class LocalDBPaths:
     database2: str
     database3: str
 
+@dataclass
+class DatabaseConfig:
+    url: Optional[str] = None  # used when use_remote_db is set
+    path: Optional[str] = None  # local SQLite file
+    pool_size: Optional[int] = None
+    max_overflow: Optional[int] = None
+    pool_recycle: Optional[int] = None  # seconds
+    pool_pre_ping: bool = False
+    statement_timeout: Optional[float] = None  # seconds, PostgreSQL only
+    read_replica_url: Optional[str] = None  # read-only sessions are routed here
+    sync_tables: Optional[List[str]] = None  # tables sync.py copies to path; None means all
+    sync_watermarks: Dict[str, str] = field(default_factory=dict)  # table -> watermark column override
+
+@dataclass
+class SQLiteProfile:
+    in_memory: bool = False
+    journal_mode: Optional[str] = None  # e.g. 'wal'; ignored for in-memory databases
+    synchronous: Optional[str] = None  # 'off', 'normal', 'full' or 'extra'
+    mmap_size: Optional[int] = None  # bytes
+    cache_size: Optional[int] = None  # pages, or KiB when negative
+    backup_on_close: bool = False  # write an in-memory database back to its file on cleanup
+    backup_interval: Optional[float] = None  # seconds between periodic write-backs
+
+# database1 has always been loaded into memory
+DEFAULT_SQLITE_PROFILES = {'database1': SQLiteProfile(in_memory=True)}
+
+@dataclass
+class QueryCacheConfig:
+    enabled: bool = False
+    max_entries: int = 256
+    max_rows: int = 200000  # total rows held across all entries
+    ttl: float = 300  # seconds
+
+@dataclass
+class InstrumentationConfig:
+    enabled: bool = False
+    slow_query_threshold: Optional[float] = None  # seconds; statements at or over it are logged
+
 @dataclass
 class OtherConfig:
     app_name: str
     version: str
+    metadata_cache_dir: Optional[str] = None  # defaults to ~/.cache/<app_name>/metadata
 
 @dataclass
 class Config:
     use_remote_db: bool
-    remote_db_config: RemoteDBConfig
-    local_db_paths: LocalDBPaths
+    remote_db_config: Optional[RemoteDBConfig]
+    local_db_paths: Optional[LocalDBPaths]
     other_config: OtherConfig
+    sqlite_profiles: Dict[str, SQLiteProfile] = field(default_factory=lambda: dict(DEFAULT_SQLITE_PROFILES))
+    query_cache: QueryCacheConfig = field(default_factory=QueryCacheConfig)
+    instrumentation: InstrumentationConfig = field(default_factory=InstrumentationConfig)
+    databases: Dict[str, DatabaseConfig] = field(default_factory=dict)
+
+    def __post_init__(self):
+        # The fixed database1..3 sections still work and fill in any database
+        # not listed under "databases"
+        for db_key in ('database1', 'database2', 'database3'):
+            url = getattr(self.remote_db_config, db_key, None)
+            path = getattr(self.local_db_paths, db_key, None)
+            if (url or path) and db_key not in self.databases:
+                self.databases[db_key] = DatabaseConfig(url=url, path=path)
 
 def load_config(config_file: str) -> Config:
     with open(config_file, 'r') as f:
         config_dict = json.load(f)
 
+    sqlite_profiles = dict(DEFAULT_SQLITE_PROFILES)
+    if "sqlite_profiles" in config_dict:
+        sqlite_profiles = {db_key: SQLiteProfile(**profile) for db_key, profile in config_dict["sqlite_profiles"].items()}
+
     return Config(
         use_remote_db=config_dict["use_remote_db"],
-        remote_db_config=RemoteDBConfig(**config_dict["remote_db_config"]),
-        local_db_paths=LocalDBPaths(**config_dict["local_db_paths"]),
-        other_config=OtherConfig(**config_dict["other_config"])
+        remote_db_config=RemoteDBConfig(**config_dict["remote_db_config"]) if "remote_db_config" in config_dict else None,
+        local_db_paths=LocalDBPaths(**config_dict["local_db_paths"]) if "local_db_paths" in config_dict else None,
+        other_config=OtherConfig(**config_dict["other_config"]),
+        sqlite_profiles=sqlite_profiles,
+        query_cache=QueryCacheConfig(**config_dict.get("query_cache", {})),
+        instrumentation=InstrumentationConfig(**config_dict.get("instrumentation", {})),
+        databases={db_key: DatabaseConfig(**database) for db_key, database in config_dict.get("databases", {}).items()}
     )
\ No newline at end of file
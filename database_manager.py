@@ -1,69 +1,262 @@
-import sqlite3
-from sqlalchemy import create_engine, MetaData
+import hashlib
+import os
+import pickle
+import threading
+from contextlib import nullcontext
+from sqlalchemy import create_engine, MetaData, Column, Integer, text
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.ext.declarative import declarative_base
-from config import Config
+from sqlalchemy.pool import QueuePool
+from config import Config, DatabaseConfig, SQLiteProfile
+from sqlite_support import MemoryDatabase, apply_sqlite_profile
+from query_cache import QueryCache
+from instrumentation import QueryInstrumentation
+
+# One round trip that changes whenever the schema does; None means "don't cache"
+POSTGRES_SCHEMA_FINGERPRINT = """
+SELECT md5(
+    coalesce((SELECT string_agg(table_name || '.' || column_name || ':' || data_type || ':' || is_nullable, ','
+                                ORDER BY table_name, ordinal_position)
+              FROM information_schema.columns WHERE table_schema = current_schema()), '')
+    || coalesce((SELECT string_agg(indexdef, ',' ORDER BY indexname)
+                 FROM pg_indexes WHERE schemaname = current_schema()), '')
+    || coalesce((SELECT string_agg(constraint_name || ':' || constraint_type, ',' ORDER BY constraint_name)
+                 FROM information_schema.table_constraints WHERE table_schema = current_schema()), '')
+)
+"""
 
 class DatabaseManager:
     def __init__(self, config: Config):
         self.config = config
         self.engines = {}
         self.sessions = {}
+        self.replica_engines = {}
+        self.replica_sessions = {}
         self.metadata = {}
+        self.memory_databases = {}
+        self._setup_lock = threading.Lock()
+        self.timeline = None  # a StartupTimeline to record database setup in, see main.py
+
+        # Opt-in result cache shared by every database, see cached_query
+        self.query_cache = None
+        if config.query_cache.enabled:
+            self.query_cache = QueryCache(
+                max_entries=config.query_cache.max_entries,
+                max_rows=config.query_cache.max_rows,
+                ttl=config.query_cache.ttl,
+            )
+
+        # Opt-in engine/pool metrics; no listeners are attached when disabled
+        self.instrumentation = None
+        if config.instrumentation.enabled:
+            self.instrumentation = QueryInstrumentation(config.instrumentation.slow_query_threshold)
 
-        self.setup_databases()
+        # Databases are connected and reflected on first use, see get_session
+        cache_dir = config.other_config.metadata_cache_dir
+        self.metadata_cache_dir = cache_dir or os.path.join(
+            os.path.expanduser('~'), '.cache', config.other_config.app_name, 'metadata'
+        )
 
     def setup_databases(self):
-        if self.config.use_remote_db:
-            self.setup_remote_database('database1', self.config.remote_db_config.database1)
-            self.setup_remote_database('database2', self.config.remote_db_config.database2)
-            self.setup_remote_database('database3', self.config.remote_db_config.database3)
-        else:
-            self.setup_local_database('database1', self.config.local_db_paths.database1, in_memory=True)
-            self.setup_local_database('database2', self.config.local_db_paths.database2, in_memory=False)
-            self.setup_local_database('database3', self.config.local_db_paths.database3, in_memory=False)
+        # Eagerly set up every database, e.g. to warm the metadata cache
+        for db_key in self.config.databases:
+            self.ensure_database(db_key)
+
+    def ensure_database(self, db_key):
+        if db_key in self.sessions:
+            return
+        with self._setup_lock:
+            if db_key in self.sessions:
+                return
+            db_config = self.config.databases.get(db_key)
+            if db_config is None:
+                raise KeyError(f"Unknown database {db_key!r}")
+            with self.timeline.measure(f'set up {db_key}') if self.timeline else nullcontext():
+                if self.config.use_remote_db and db_config.url:
+                    self.setup_remote_database(db_key, db_config.url, db_config)
+                elif db_config.path:
+                    profile = self.config.sqlite_profiles.get(db_key) or SQLiteProfile()
+                    self.setup_local_database(db_key, db_config.path, profile, db_config)
+                else:
+                    raise ValueError(f"No {'url' if self.config.use_remote_db else 'path'} configured for {db_key!r}")
 
-    def setup_remote_database(self, db_key, db_url):
-        engine = create_engine(db_url)
+    def engine_options(self, db_url, db_config):
+        # Only settings that were configured are passed, so the rest keep SQLAlchemy's defaults
+        options = {name: getattr(db_config, name) for name in ('pool_size', 'max_overflow', 'pool_recycle')
+                   if getattr(db_config, name) is not None}
+        if db_config.pool_pre_ping:
+            options['pool_pre_ping'] = True
+        if db_config.statement_timeout and db_url.startswith('postgresql'):
+            options['connect_args'] = {'options': f'-c statement_timeout={int(db_config.statement_timeout * 1000)}'}
+        return options
+
+    def setup_remote_database(self, db_key, db_url, db_config=None):
+        db_config = db_config or DatabaseConfig(url=db_url)
+        engine = create_engine(db_url, **self.engine_options(db_url, db_config))
+        if self.instrumentation:
+            self.instrumentation.attach(db_key, engine)
         session_factory = sessionmaker(bind=engine)
+        if self.query_cache:
+            self.query_cache.attach(db_key, session_factory)
+        if db_config.read_replica_url:
+            self.setup_read_replica(db_key, db_config.read_replica_url, db_config)
         self.engines[db_key] = engine
-        self.metadata[db_key] = MetaData(bind=engine)
-        self.metadata[db_key].reflect()
+        self.metadata[db_key] = self.reflect_metadata(engine, db_url)
         self.sessions[db_key] = scoped_session(session_factory)
 
-    def setup_local_database(self, db_key, db_path, in_memory):
-        if in_memory:
-            conn = self.copy_db_to_memory(db_path)
-            engine = self.create_memory_engine(conn)
+    def setup_read_replica(self, db_key, replica_url, db_config):
+        # Same pool tuning as the primary; metadata is always reflected from the primary
+        engine = create_engine(replica_url, **self.engine_options(replica_url, db_config))
+        if self.instrumentation:
+            self.instrumentation.attach(f'{db_key}-replica', engine)
+        self.replica_engines[db_key] = engine
+        self.replica_sessions[db_key] = scoped_session(sessionmaker(bind=engine))
+
+    def setup_local_database(self, db_key, db_path, profile, db_config=None):
+        db_config = db_config or DatabaseConfig(path=db_path)
+        options = self.engine_options(f'sqlite:///{db_path}', db_config)
+        if profile.in_memory:
+            memory_db = MemoryDatabase(db_path)
+            engine = memory_db.create_engine(**options)
+            self.memory_databases[db_key] = memory_db
+            if profile.backup_interval:
+                memory_db.start_periodic_write_back(profile.backup_interval)
         else:
-            engine = create_engine(f'sqlite:///{db_path}')
-            
+            if 'pool_size' in options or 'max_overflow' in options:
+                options['poolclass'] = QueuePool  # file databases otherwise get a pool without these settings
+            engine = create_engine(f'sqlite:///{db_path}', **options)
+        apply_sqlite_profile(engine, profile, in_memory=profile.in_memory)
+        if self.instrumentation:
+            self.instrumentation.attach(db_key, engine)
+
         session_factory = sessionmaker(bind=engine)
+        if self.query_cache:
+            self.query_cache.attach(db_key, session_factory)
         self.engines[db_key] = engine
-        self.metadata[db_key] = MetaData(bind=engine)
-        self.metadata[db_key].reflect()
+        self.metadata[db_key] = self.reflect_metadata(engine, f'sqlite:///{os.path.abspath(db_path)}')
         self.sessions[db_key] = scoped_session(session_factory)
 
-    def copy_db_to_memory(self, source_db_path):
-        source_conn = sqlite3.connect(source_db_path)
-        memory_conn = sqlite3.connect(':memory:')
-        source_conn.backup(memory_conn)
-        source_conn.close()
-        return memory_conn
+    def schema_fingerprint(self, engine):
+        with engine.connect() as connection:
+            if engine.dialect.name == 'sqlite':
+                # Bumped by SQLite on every schema change
+                return str(connection.execute(text('PRAGMA schema_version')).scalar())
+            if engine.dialect.name == 'postgresql':
+                return connection.execute(text(POSTGRES_SCHEMA_FINGERPRINT)).scalar()
+        return None
+
+    def reflect_metadata(self, engine, cache_url):
+        # Reflected metadata is pickled to disk, keyed by URL and schema fingerprint,
+        # so an unchanged schema costs one query instead of a full reflection
+        fingerprint = self.schema_fingerprint(engine)
+        if fingerprint is None:
+            metadata = MetaData(bind=engine)
+            metadata.reflect()
+            return metadata
+
+        url_key = hashlib.sha256(cache_url.encode()).hexdigest()[:32]
+        schema_key = hashlib.sha256(fingerprint.encode()).hexdigest()[:32]
+        cache_path = os.path.join(self.metadata_cache_dir, f'{url_key}-{schema_key}.pickle')
+        try:
+            with open(cache_path, 'rb') as f:
+                metadata = pickle.load(f)
+            metadata.bind = engine
+            return metadata
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            # Unreadable, truncated or pickled by another SQLAlchemy version: reflect and overwrite it
+            print(f"Ignoring metadata cache {cache_path}: {e!r}")
 
-    def create_memory_engine(self, memory_conn):
-        db_url = 'sqlite://'
-        engine = create_engine(db_url, creator=lambda: memory_conn)
-        return engine
+        metadata = MetaData(bind=engine)
+        metadata.reflect()
+        try:
+            os.makedirs(self.metadata_cache_dir, exist_ok=True)
+            temp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(temp_path, 'wb') as f:
+                pickle.dump(metadata, f)
+            os.replace(temp_path, cache_path)
+            # Drop entries for older schemas of the same database
+            for name in os.listdir(self.metadata_cache_dir):
+                if name.startswith(f'{url_key}-') and name.endswith('.pickle') and name != os.path.basename(cache_path):
+                    os.remove(os.path.join(self.metadata_cache_dir, name))
+        except OSError as e:
+            print(f"Could not cache metadata: {e}")
+        return metadata
 
-    def get_session(self, db_key):
+    def get_session(self, db_key, read_only=False):
+        # Read-only sessions use the database's read replica when one is configured
+        self.ensure_database(db_key)
+        if read_only and db_key in self.replica_sessions:
+            return self.replica_sessions[db_key]
         return self.sessions[db_key]
 
+    def get_metadata(self, db_key):
+        self.ensure_database(db_key)
+        return self.metadata[db_key]
+
+    def cache_key(self, db_key, statement):
+        if self.query_cache is None:
+            return None
+        self.ensure_database(db_key)
+        return self.query_cache.make_key(db_key, statement, self.engines[db_key].dialect)
+
+    def cached_query(self, db_key, statement):
+        # Returns (columns, rows); repeated reads are served from the cache until
+        # a commit writes to one of the tables involved or the entry expires
+        key = self.cache_key(db_key, statement)
+        if key is not None:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return cached
+
+        generation = self.query_cache.generation(db_key) if key is not None else None
+        # A session of its own: the caller's thread-local session may hold pending work
+        with self.get_session(db_key, read_only=True).session_factory() as session:
+            result = session.execute(statement)
+            columns, rows = list(result.keys()), [tuple(row) for row in result]
+        self.record_rows(db_key, len(rows))
+        if key is not None:
+            self.query_cache.put(key, statement, columns, rows, generation)
+        return columns, rows
+
+    def record_rows(self, db_key, count):
+        if self.instrumentation:
+            self.instrumentation.record_rows(db_key, count)
+
+    def metrics_snapshot(self):
+        return self.instrumentation.snapshot() if self.instrumentation else {}
+
+    def export_metrics(self, format='json'):
+        # 'json' or 'prometheus' (text exposition format)
+        if self.instrumentation is None:
+            return '{}' if format == 'json' else ''
+        if format == 'prometheus':
+            return self.instrumentation.to_prometheus()
+        return self.instrumentation.to_json()
+
+    def stream_query(self, db_key, statement, batch_size=1000, parent=None, on_error=None):
+        # Runs the statement (or a callable building it) on the Qt thread pool and
+        # returns a table model that pages the rows in as the view scrolls;
+        # on_error(message) is connected before the worker starts, so no error is missed
+        from query_runner import QueryWorker, StreamingTableModel
+
+        model = StreamingTableModel(parent)
+        model.start(QueryWorker(self, db_key, statement, batch_size=batch_size), on_error=on_error)
+        return model
+
     def cleanup(self):
         for key in self.sessions:
             self.sessions[key].remove()  # Remove the session
+        for key in self.replica_sessions:
+            self.replica_sessions[key].remove()
         for key in self.engines:
             self.engines[key].dispose()  # Dispose the engine
+        for key in self.replica_engines:
+            self.replica_engines[key].dispose()
+        for key, memory_db in self.memory_databases.items():
+            profile = self.config.sqlite_profiles.get(key) or SQLiteProfile()
+            memory_db.close(write_back=profile.backup_on_close)
 
 # Base class for SQLAlchemy models
 Base = declarative_base()
@@ -71,9 +264,12 @@ Base = declarative_base()
 # Placeholder for actual models
 class ExampleTable1(Base):
     __tablename__ = 'example_table1'
+    id = Column(Integer, primary_key=True)
 
 class ExampleTable2(Base):
     __tablename__ = 'example_table2'
+    id = Column(Integer, primary_key=True)
 
 class ExampleTable3(Base):
-    __tablename__ = 'example_table3'
\ No newline at end of file
+    __tablename__ = 'example_table3'
+    id = Column(Integer, primary_key=True)
@@ -0,0 +1,203 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        cumulative, buckets = 0, {}
+        for bound, count in zip(list(self.buckets) + ['+Inf'], self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+class DatabaseMetrics:
+    def __init__(self):
+        self.statement_latency = Histogram()
+        self.checkout_wait = Histogram()
+        self.statements = 0
+        self.errors = 0
+        self.slow_statements = 0
+        self.rows = 0  # rowcount as reported by the driver (SQLite reports none for SELECT)
+        self.rows_fetched = 0  # rows read by DatabaseManager's query helpers
+        self.connections_created = 0
+        self.checkouts = 0
+        self.checkins = 0
+
+class QueryInstrumentation:
+    # Engine and pool event listeners that record per-database statement latency,
+    # row counts and pool checkout waits. Nothing is attached unless enabled, so a
+    # disabled DatabaseManager pays no per-statement cost.
+    def __init__(self, slow_query_threshold=None):
+        self.slow_query_threshold = slow_query_threshold
+        self.metrics = defaultdict(DatabaseMetrics)
+        self.engines = {}
+        self.lock = threading.Lock()
+
+    def attach(self, db_key, engine):
+        self.engines[db_key] = engine
+        metrics = self.metrics[db_key]
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['query_start_times'].pop()
+            rowcount = getattr(cursor, 'rowcount', -1)
+            slow = self.slow_query_threshold is not None and elapsed >= self.slow_query_threshold
+            with self.lock:
+                metrics.statements += 1
+                metrics.statement_latency.observe(elapsed)
+                if rowcount and rowcount > 0:
+                    metrics.rows += rowcount
+                if slow:
+                    metrics.slow_statements += 1
+            if slow:
+                logger.warning("Slow query on %s (%.3fs): %s", db_key, elapsed, ' '.join(statement.split())[:2000])
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(exception_context):
+            connection = exception_context.connection
+            if connection is not None and connection.info.get('query_start_times'):
+                connection.info['query_start_times'].pop()
+            with self.lock:
+                metrics.errors += 1
+
+        @event.listens_for(engine, 'connect')
+        def connect(dbapi_connection, connection_record):
+            with self.lock:
+                metrics.connections_created += 1
+
+        @event.listens_for(engine, 'checkout')
+        def checkout(dbapi_connection, connection_record, connection_proxy):
+            with self.lock:
+                metrics.checkouts += 1
+
+        @event.listens_for(engine, 'checkin')
+        def checkin(dbapi_connection, connection_record):
+            with self.lock:
+                metrics.checkins += 1
+
+        # The pool has no event for the start of a checkout, so time the pool's
+        # own acquire step to see how long callers wait for a connection
+        pool = engine.pool
+        do_get = pool._do_get
+
+        def timed_do_get():
+            started = time.perf_counter()
+            try:
+                return do_get()
+            finally:
+                waited = time.perf_counter() - started
+                with self.lock:
+                    metrics.checkout_wait.observe(waited)
+
+        pool._do_get = timed_do_get
+
+    def record_rows(self, db_key, count):
+        with self.lock:
+            self.metrics[db_key].rows_fetched += count
+
+    def pool_status(self, db_key):
+        pool = self.engines[db_key].pool
+        status = {'pool_class': type(pool).__name__}
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                status[name] = getattr(pool, name)()
+        return status
+
+    def snapshot(self):
+        with self.lock:
+            snapshot = {
+                db_key: {
+                    'statements': metrics.statements,
+                    'errors': metrics.errors,
+                    'slow_statements': metrics.slow_statements,
+                    'rows': metrics.rows,
+                    'rows_fetched': metrics.rows_fetched,
+                    'statement_latency_seconds': metrics.statement_latency.snapshot(),
+                    'pool_checkout_wait_seconds': metrics.checkout_wait.snapshot(),
+                    'connections_created': metrics.connections_created,
+                    'checkouts': metrics.checkouts,
+                    'checkins': metrics.checkins,
+                }
+                for db_key, metrics in self.metrics.items()
+            }
+        for db_key in snapshot:
+            if db_key in self.engines:
+                snapshot[db_key]['pool'] = self.pool_status(db_key)
+        return snapshot
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def to_prometheus(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        snapshot = self.snapshot()
+        counters = [
+            ('statements', 'db_statements_total', 'Statements executed'),
+            ('errors', 'db_statement_errors_total', 'Statements that raised'),
+            ('slow_statements', 'db_slow_statements_total', 'Statements over the slow query threshold'),
+            ('rows', 'db_rows_total', 'Rows reported by the driver'),
+            ('rows_fetched', 'db_rows_fetched_total', 'Rows read by the query helpers'),
+            ('connections_created', 'db_pool_connections_created_total', 'DBAPI connections opened'),
+            ('checkouts', 'db_pool_checkouts_total', 'Pool checkouts'),
+            ('checkins', 'db_pool_checkins_total', 'Pool checkins'),
+        ]
+        for key, name, help_text in counters:
+            metric(name, 'counter', help_text, [f'{name}{{db="{db_key}"}} {values[key]}' for db_key, values in snapshot.items()])
+
+        histograms = [
+            ('statement_latency_seconds', 'db_statement_duration_seconds', 'Statement execution time'),
+            ('pool_checkout_wait_seconds', 'db_pool_checkout_wait_seconds', 'Time spent waiting for a pooled connection'),
+        ]
+        for key, name, help_text in histograms:
+            samples = []
+            for db_key, values in snapshot.items():
+                histogram = values[key]
+                for bound, count in histogram['buckets'].items():
+                    samples.append(f'{name}_bucket{{db="{db_key}",le="{bound}"}} {count}')
+                samples.append(f'{name}_sum{{db="{db_key}"}} {histogram["sum"]}')
+                samples.append(f'{name}_count{{db="{db_key}"}} {histogram["count"]}')
+            metric(name, 'histogram', help_text, samples)
+
+        gauges = [('checkedout', 'db_pool_checked_out', 'Connections currently checked out'),
+                  ('checkedin', 'db_pool_checked_in', 'Idle connections in the pool'),
+                  ('overflow', 'db_pool_overflow', 'Connections beyond pool_size'),
+                  ('size', 'db_pool_size', 'Configured pool size')]
+        for key, name, help_text in gauges:
+            samples = [f'{name}{{db="{db_key}"}} {values["pool"][key]}'
+                       for db_key, values in snapshot.items() if key in values.get('pool', {})]
+            if samples:
+                metric(name, 'gauge', help_text, samples)
+        return '\n'.join(lines) + '\n'
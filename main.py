@@ -1,59 +1,129 @@
-from PyQt6.QtWidgets import QApplication, QMainWindow, QStackedWidget, QPushButton, QWidget
+import time
+STARTED = time.perf_counter()
+
+import argparse
+import importlib
 import sys
-from config import load_config
-from database_manager import DatabaseManager
-from widget_a import WidgetA
-from widget_b import WidgetB
+from startup_timeline import StartupTimeline
+
+# Everything heavy is imported inside timed steps so the startup report can show
+# where time-to-first-window goes
+timeline = StartupTimeline(STARTED)
+with timeline.measure('import PyQt6'):
+    from PyQt6.QtCore import QTimer
+    from PyQt6.QtWidgets import QApplication, QHBoxLayout, QMainWindow, QPushButton, QStackedWidget, QVBoxLayout, QWidget
+
+# Pages as (button label, module, class); a page's module is only imported and
+# its widget only built the first time it is shown
+WIDGETS = {
+    'widget_a': ('Show WidgetA', 'widget_a', 'WidgetA'),
+    'widget_b': ('Show WidgetB', 'widget_b', 'WidgetB'),
+}
 
 class MainWindow(QMainWindow):
     def __init__(self, db_manager, other_config):
         super().__init__()
         self.db_manager = db_manager
         self.other_config = other_config
+        self.pages = {}
+        self.closed = False
         self.setWindowTitle(self.other_config.app_name)
 
         self.init_ui()
 
     def init_ui(self):
+        central = QWidget()
+        layout = QVBoxLayout(central)
+        self.setCentralWidget(central)
+
+        # Buttons to switch between widgets
+        buttons = QHBoxLayout()
+        for name, (label, _, _) in WIDGETS.items():
+            button = QPushButton(label)
+            button.clicked.connect(lambda checked=False, name=name: self.show_page(name))
+            buttons.addWidget(button)
+        layout.addLayout(buttons)
+
         self.stacked_widget = QStackedWidget()
-        self.setCentralWidget(self.stacked_widget)
-        
-        # Instantiate other main widgets with db_manager
-        self.widget_a = WidgetA(self.db_manager)
-        self.widget_b = WidgetB(self.db_manager)
-        
-        # Add widgets to the stacked widget
-        self.stacked_widget.addWidget(self.widget_a)
-        self.stacked_widget.addWidget(self.widget_b)
-        
-        # Sample buttons to switch between widgets
-        button1 = QPushButton('Show WidgetA')
-        button1.clicked.connect(self.show_widget_a)
-        self.stacked_widget.addWidget(button1)
-
-        button2 = QPushButton('Show WidgetB')
-        button2.clicked.connect(self.show_widget_b)
-        self.stacked_widget.addWidget(button2)
+        layout.addWidget(self.stacked_widget)
+
+    def page(self, name):
+        if name not in self.pages:
+            _, module_name, class_name = WIDGETS[name]
+            with timeline.measure(f'import {module_name}'):
+                module = importlib.import_module(module_name)
+            with timeline.measure(f'construct {class_name}'):
+                widget = getattr(module, class_name)(self.db_manager)
+            self.stacked_widget.addWidget(widget)
+            self.pages[name] = widget
+        return self.pages[name]
+
+    def show_page(self, name):
+        self.stacked_widget.setCurrentWidget(self.page(name))
 
     def show_widget_a(self):
-        self.stacked_widget.setCurrentWidget(self.widget_a)
+        self.show_page('widget_a')
 
     def show_widget_b(self):
-        self.stacked_widget.setCurrentWidget(self.widget_b)
+        self.show_page('widget_b')
+
+    def shutdown(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Streaming queries go first, they hold connections from the engines cleanup disposes
+        from query_runner import cancel_queries
+        cancel_queries()
+        if self.db_manager is not None:
+            self.db_manager.cleanup()
 
     def closeEvent(self, event):
         # Perform cleanup before closing
-        self.db_manager.cleanup()
+        self.shutdown()
         event.accept()
 
-# Main application entry point, simplified
-if __name__ == '__main__':
-    config_file = 'path/to/config.json'
+def main():
+    parser = argparse.ArgumentParser(description="Database desktop client")
+    parser.add_argument('config', nargs='?', default='path/to/config.json', help="config file")
+    parser.add_argument('--startup-report', nargs='?', const='-', metavar='FILE',
+                        help="print the startup timeline to stderr once the first page is up; "
+                             "with FILE, also write it as JSON on exit, including later database setup")
+    args, qt_args = parser.parse_known_args()
+
+    with timeline.measure('import config'):
+        from config import load_config
+    with timeline.measure('load config'):
+        config = load_config(args.config)
+
+    with timeline.measure('create QApplication'):
+        app = QApplication(sys.argv[:1] + qt_args)
+    with timeline.measure('create main window'):
+        # The database manager (and SQLAlchemy with it) is attached once the window is up
+        main_window = MainWindow(None, config.other_config)
+    with timeline.measure('show main window'):
+        main_window.show()
 
-    config = load_config(config_file)
-    db_manager = DatabaseManager(config)
+    def show_first_page():
+        # After the event loop starts, so the window paints before SQLAlchemy is imported
+        with timeline.measure('import database_manager'):
+            from database_manager import DatabaseManager
+        with timeline.measure('create DatabaseManager'):
+            # Databases are set up on first use, which the timeline records as 'set up <key>'
+            main_window.db_manager = DatabaseManager(config)
+            main_window.db_manager.timeline = timeline
+        main_window.show_page(next(iter(WIDGETS)))
+        timeline.mark('first page shown')
+        if args.startup_report:
+            print(timeline.report(), file=sys.stderr)
 
-    app = QApplication(sys.argv)
-    main_window = MainWindow(db_manager, config.other_config)
-    main_window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    QTimer.singleShot(0, show_first_page)
+    app.aboutToQuit.connect(main_window.shutdown)  # also when quitting without closing the window
+    status = app.exec()
+    if args.startup_report and args.startup_report != '-':
+        with open(args.startup_report, 'w') as f:
+            f.write(timeline.to_json(indent=2))
+    sys.exit(status)
+
+# Main application entry point, simplified
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import Table, event
+from sqlalchemy.orm import object_mapper
+from sqlalchemy.sql import visitors
+
+def statement_tables(statement):
+    return frozenset(element.name for element in visitors.iterate(statement) if isinstance(element, Table))
+
+class QueryCache:
+    # LRU result cache bounded by entry count and total rows, with a TTL.
+    # Entries are dropped when a session commits writes to any table they read.
+    def __init__(self, max_entries=256, max_rows=200000, ttl=300):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at, tables, columns, rows)
+        self.total_rows = 0
+        self.generations = {}  # db_key -> writes committed so far, see put
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    def make_key(self, db_key, statement, dialect):
+        compiled = statement.compile(dialect=dialect)
+        return db_key, str(compiled), repr(sorted(compiled.params.items()))
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2], entry[3]
+
+    def generation(self, db_key):
+        # Taken before running a query and handed to put
+        with self.lock:
+            return self.generations.get(db_key, 0)
+
+    def put(self, key, statement, columns, rows, generation=None):
+        if len(rows) > self.max_rows:
+            return
+        with self.lock:
+            # Skipped if a commit landed while the rows were being read, they may predate it
+            if generation is not None and generation != self.generations.get(key[0], 0):
+                return
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.monotonic() + self.ttl, statement_tables(statement), columns, rows)
+            self.total_rows += len(rows)
+            while len(self.entries) > self.max_entries or self.total_rows > self.max_rows:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        self.total_rows -= len(entry[3])
+
+    def invalidate(self, db_key, tables):
+        with self.lock:
+            self.generations[db_key] = self.generations.get(db_key, 0) + 1
+            stale = [key for key, entry in self.entries.items() if key[0] == db_key and entry[1] & tables]
+            for key in stale:
+                self._remove(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.total_rows = 0
+
+    def attach(self, db_key, session_factory):
+        # Tables written in a transaction are collected on flush and ORM-enabled
+        # DML, then invalidated once the transaction commits
+        @event.listens_for(session_factory, 'after_flush')
+        def collect_flushed(session, flush_context):
+            written = session.info.setdefault('query_cache_tables', set())
+            for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+                written.update(table.name for table in object_mapper(obj).tables)
+
+        @event.listens_for(session_factory, 'do_orm_execute')
+        def collect_executed(orm_execute_state):
+            if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+                written = orm_execute_state.session.info.setdefault('query_cache_tables', set())
+                written.update(statement_tables(orm_execute_state.statement))
+
+        @event.listens_for(session_factory, 'after_commit')
+        def invalidate_committed(session):
+            written = session.info.pop('query_cache_tables', None)
+            if written:
+                self.invalidate(db_key, frozenset(written))
+
+        @event.listens_for(session_factory, 'after_rollback')
+        def discard_rolled_back(session):
+            session.info.pop('query_cache_tables', None)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'rows': self.total_rows,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
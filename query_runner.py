@@ -0,0 +1,172 @@
+import threading
+from collections import deque
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+
+# Workers that haven't finished yet. Shutdown cancels them through here, and holding
+# them keeps their signals alive until finished has been emitted.
+_running = set()
+_running_lock = threading.Lock()
+
+def cancel_queries(thread_pool=None):
+    # A worker waiting for the view to ask for more rows holds a cursor and a read
+    # transaction, and keeps the process from exiting; call before disposing engines
+    with _running_lock:
+        workers = list(_running)
+    for worker in workers:
+        worker.cancel()
+    (thread_pool or QThreadPool.globalInstance()).waitForDone()
+
+class QuerySignals(QObject):
+    columns = pyqtSignal(list)
+    batch = pyqtSignal(list)
+    finished = pyqtSignal()
+    error = pyqtSignal(str)
+
+class QueryWorker(QRunnable):
+    # Runs a statement on a QThreadPool thread and streams the rows back in batches.
+    # Only prefetch_batches batches are read ahead of what the model asked for,
+    # so a huge table is paged in as the view scrolls instead of all at once.
+    def __init__(self, db_manager, db_key, statement, batch_size=1000, prefetch_batches=2):
+        super().__init__()
+        self.db_manager = db_manager
+        self.db_key = db_key
+        self.statement = statement
+        self.batch_size = batch_size
+        self.signals = QuerySignals()
+        self._permits = threading.Semaphore(prefetch_batches)
+        self._cancelled = threading.Event()
+        self.setAutoDelete(False)  # Python owns the worker, see _running
+
+    def request_more(self):
+        self._permits.release()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._permits.release()
+
+    def run(self):
+        scoped = session = None
+        try:
+            if self._cancelled.is_set():
+                return
+            # Lazy database setup and reflection also happen here, off the GUI thread, and
+            # their failures must reach the error signal: an exception escaping run() aborts Qt
+            scoped = self.db_manager.get_session(self.db_key, read_only=True)
+            session = scoped()
+            statement = self.statement() if callable(self.statement) else self.statement
+            cache = self.db_manager.query_cache
+            key = self.db_manager.cache_key(self.db_key, statement)
+            cached = cache.get(key) if key is not None else None
+            generation = cache.generation(self.db_key) if key is not None else None
+            if cached is not None:
+                columns, rows = cached
+                partitions = (rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size))
+            else:
+                result = session.execute(statement.execution_options(stream_results=True))
+                columns, rows = list(result.keys()), []
+                partitions = ([tuple(row) for row in partition] for partition in result.partitions(self.batch_size))
+
+            self.signals.columns.emit(columns)
+            complete = True
+            for partition in partitions:
+                self._permits.acquire()
+                if self._cancelled.is_set():
+                    complete = False
+                    break
+                if cached is None and key is not None and len(rows) <= cache.max_rows:
+                    rows.extend(partition)  # Collected for the cache while it still fits
+                self.signals.batch.emit(partition)
+                if cached is None:
+                    self.db_manager.record_rows(self.db_key, len(partition))
+
+            if cached is None:
+                result.close()
+                if key is not None and complete and len(rows) <= cache.max_rows:
+                    cache.put(key, statement, columns, rows, generation)
+        except Exception as e:
+            if session is not None:
+                session.rollback()
+            self.signals.error.emit(str(e))
+        finally:
+            if scoped is not None:
+                scoped.remove()
+            self.signals.finished.emit()
+            with _running_lock:
+                _running.discard(self)
+
+class StreamingTableModel(QAbstractTableModel):
+    def __init__(self, parent=None, fetch_size=200):
+        super().__init__(parent)
+        self.fetch_size = fetch_size
+        self.worker = None
+        self._columns = []
+        self._rows = []
+        self._pending = deque()  # received from the worker, not yet shown
+        self._finished = False
+        self._requested = False
+        self._waiting = False  # the view asked for rows before any arrived
+
+    def start(self, worker, thread_pool=None, on_error=None):
+        self.worker = worker
+        worker.signals.columns.connect(self._on_columns)
+        worker.signals.batch.connect(self._on_batch)
+        worker.signals.finished.connect(self._on_finished)
+        if on_error is not None:
+            worker.signals.error.connect(on_error)
+        with _running_lock:
+            _running.add(worker)
+        (thread_pool or QThreadPool.globalInstance()).start(worker)
+
+    def cancel(self):
+        if self.worker and not self._finished:
+            self.worker.cancel()
+
+    def _on_columns(self, columns):
+        self.beginResetModel()
+        self._columns = columns
+        self.endResetModel()
+
+    def _on_batch(self, rows):
+        self._requested = False
+        self._pending.extend(rows)
+        if self._waiting or not self._rows:
+            self.fetchMore(QModelIndex())
+
+    def _on_finished(self):
+        self._finished = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._columns)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self._rows[index.row()][index.column()]
+        return None if value is None else str(value)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal and section < len(self._columns):
+            return self._columns[section]
+        return str(section + 1)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and (bool(self._pending) or not self._finished)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.fetch_size, len(self._pending))
+        self._waiting = count == 0
+        if count:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + count - 1)
+            self._rows.extend(self._pending.popleft() for _ in range(count))
+            self.endInsertRows()
+        # Keep one batch in reserve so scrolling never waits on the database
+        if self.worker and not self._finished and not self._requested and len(self._pending) < self.worker.batch_size:
+            self._requested = True
+            self.worker.request_more()
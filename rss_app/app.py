@@ -1,31 +1,58 @@
 from flask import Flask
 from flask_bootstrap import Bootstrap
-from flask_pymongo import PyMongo
-from flask_sse import sse
 from dotenv import load_dotenv
+from pymongo.errors import PyMongoError
 import os
 import threading
 
 load_dotenv()
 
 from config import Config
+from extensions import mongo, feed_collection, ensure_indexes, init_caches
 from routes import main_bp
-from utils import monitor_changes
+from utils import monitor_changes, OrjsonProvider
 
-app = Flask(__name__)
-app.config.from_object(Config)
+def create_app(config_overrides=None, mongo_client=None):
+    # `flask run` picks this factory up; mongo_client swaps in a stand-in such as
+    # mongomock for benchmarks and tests
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config.update(config_overrides or {})
+    app.json = OrjsonProvider(app)
 
-mongo = PyMongo(app)
-Bootstrap(app)
-app.register_blueprint(sse, url_prefix='/stream')
+    if app.config['SSE_BACKEND'] == 'redis':
+        from flask_sse import sse
+    else:
+        from broadcaster import sse
+
+    if mongo_client is None:
+        mongo.init_app(app)
+    else:
+        mongo.cx = mongo_client
+        mongo.db = mongo_client.get_database(app.config.get('MONGO_DBNAME', 'rss_app'))
+    init_caches(app)
+    Bootstrap(app)
+    app.register_blueprint(main_bp)
+    app.register_blueprint(sse, url_prefix='/stream')
 
-def start_monitoring():
     with app.app_context():
-        monitor_changes(mongo, sse)
+        try:
+            ensure_indexes(feed_collection())
+        except PyMongoError as e:
+            print(f"Could not ensure feed indexes: {e}")
+
+    stop_event = threading.Event()
+    app.extensions['feed_monitor_stop'] = stop_event
+
+    def start_monitoring():
+        with app.app_context():
+            monitor_changes(mongo, sse, stop_event=stop_event)
 
-# Start a thread to monitor MongoDB changes
-monitor_thread = threading.Thread(target=start_monitoring, daemon=True)
-monitor_thread.start()
+    # Start a thread to monitor MongoDB changes and push new documents to /stream
+    if app.config['START_MONITOR']:
+        monitor_thread = threading.Thread(target=start_monitoring, daemon=True)
+        monitor_thread.start()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True, threaded=True)
\ No newline at end of file
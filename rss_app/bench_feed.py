@@ -0,0 +1,336 @@
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+import mongomock
+from PIL import Image
+
+from app import create_app
+from config import Config
+from extensions import feed_collection
+
+# Feed API benchmark: seeds a mongomock stand-in, drives the app with concurrent
+# simulated clients through Flask's test client and writes per-endpoint results.
+# The app runs in this process, so RSS figures include the simulated clients.
+DATABASE = 'feedbench'
+WORDS = ('market', 'storm', 'election', 'rocket', 'launch', 'city', 'council', 'river', 'flood', 'energy',
+         'grid', 'vote', 'report', 'policy', 'school', 'budget', 'harbor', 'bridge', 'festival', 'museum')
+
+
+def make_image(size, seed):
+    # Noise so PNG compression doesn't shrink every image to nothing
+    rnd = random.Random(seed)
+    image = Image.frombytes('RGB', (size, size), bytes(rnd.getrandbits(8) for _ in range(size * size * 3)))
+    output = io.BytesIO()
+    image.save(output, format='PNG')
+    return base64.b64encode(output.getvalue()).decode()
+
+
+def seed_documents(collection, documents, image_ratio, image_size, seed=0):
+    rnd = random.Random(seed)
+    images = [make_image(image_size, i) for i in range(8)] if image_ratio else []
+    newest = datetime.now(timezone.utc).replace(tzinfo=None)
+    batch = []
+    for i in range(documents):
+        document = {
+            'title': f"Item {i} " + ' '.join(rnd.choice(WORDS) for _ in range(6)),
+            'text': ' '.join(rnd.choice(WORDS) for _ in range(60)),
+            'datetime': newest - timedelta(seconds=rnd.randint(0, 90 * 86400)),
+        }
+        if images and rnd.random() < image_ratio:
+            document['image'] = images[i % len(images)]
+        batch.append(document)
+        if len(batch) == 1000:
+            collection.insert_many(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, bytes, status)]
+        self.requests = defaultdict(list)  # endpoint -> [(url, headers)], replayed by endpoint_rss
+        self.lock = threading.Lock()
+
+    def request(self, client, endpoint, url, headers=None):
+        started = time.perf_counter()
+        response = client.get(url, headers=headers or {})
+        elapsed = time.perf_counter() - started
+        with self.lock:
+            self.samples[endpoint].append((elapsed, len(response.data), response.status_code))
+            self.requests[endpoint].append((url, headers))
+        return response
+
+    def add(self, endpoint, seconds, size=0, status=200):
+        with self.lock:
+            self.samples[endpoint].append((seconds, size, status))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))] if values else 0.0
+
+
+def simulate_client(app, recorder, pages, refreshes, pagination, fetch_images):
+    client = app.test_client()
+    # Initial load
+    first = recorder.request(client, 'get_documents:first', '/get_documents?limit=10')
+    recorder.request(client, 'latest_document', '/latest_document')
+    documents = first.get_json()['documents']
+    if fetch_images:
+        for document in documents:
+            if document.get('image'):
+                recorder.request(client, 'image', document['image'])
+
+    # Deep "load more" paging
+    if pagination in ('keyset', 'both'):
+        cursor = first.get_json()['next_cursor']
+        for _ in range(pages):
+            if not cursor:
+                break
+            cursor = recorder.request(client, 'get_documents:keyset', f'/get_documents?limit=10&cursor={cursor}').get_json()['next_cursor']
+    if pagination in ('page', 'both'):
+        for page in range(2, pages + 2):
+            recorder.request(client, 'get_documents:page', f'/get_documents?limit=10&page={page}')
+
+    # Refresh, revalidating the first page like a browser would
+    etag = first.headers.get('ETag')
+    for _ in range(refreshes):
+        recorder.request(client, 'get_documents:refresh', '/get_documents?limit=10', headers={'If-None-Match': etag} if etag else None)
+
+
+def benchmark_sse(app, recorder, subscribers, events, interval):
+    # Time from insert to receipt on every subscriber, through the change monitor
+    sent = {}
+    ready = threading.Barrier(subscribers + 1)
+
+    def subscribe():
+        response = app.test_client().get('/stream', buffered=False)
+        chunks = iter(response.response)
+        next(chunks)  # retry hint sent on connect
+        ready.wait()
+        received = 0
+        try:
+            for chunk in chunks:
+                if chunk.startswith(b':'):
+                    continue
+                now = time.perf_counter()
+                data = json.loads(chunk.split(b'data: ', 1)[1])
+                if data['title'] not in sent:
+                    continue
+                recorder.add('sse', now - sent[data['title']], len(chunk))
+                received += 1
+                if received == events:
+                    break
+        finally:
+            response.close()
+
+    threads = [threading.Thread(target=subscribe, daemon=True) for _ in range(subscribers)]
+    for thread in threads:
+        thread.start()
+    ready.wait()
+    with app.app_context():
+        collection = feed_collection()
+        for i in range(events):
+            title = f'sse-{i}'
+            sent[title] = time.perf_counter()
+            collection.insert_one({'title': title, 'text': 'pushed', 'datetime': datetime.now(timezone.utc).replace(tzinfo=None)})
+            time.sleep(interval)
+    for thread in threads:
+        thread.join(timeout=30)
+
+
+def current_rss_bytes():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RssSampler:
+    # Samples the process RSS in the background while a phase runs. The app is
+    # served from this process, so this is server memory plus the simulated clients'.
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.stop_event = threading.Event()
+
+    def __enter__(self):
+        self.before = self.peak = current_rss_bytes()
+        self.thread = threading.Thread(target=self.sample, daemon=True)
+        self.thread.start()
+        return self
+
+    def sample(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __exit__(self, *exc_info):
+        self.stop_event.set()
+        self.thread.join()
+        self.after = current_rss_bytes()
+        self.peak = max(self.peak, self.after)
+
+    def result(self):
+        return {'before_bytes': self.before, 'peak_bytes': self.peak, 'after_bytes': self.after}
+
+
+def endpoint_rss(app, recorder, clients):
+    # Replays each endpoint's recorded requests on their own, so memory can be put
+    # down to one endpoint at a time; the concurrent phase mixes them all
+    results = {}
+    for endpoint, requests in sorted(recorder.requests.items()):
+        shares = [requests[i::clients] for i in range(clients)]
+
+        def replay(share):
+            client = app.test_client()
+            for url, headers in share:
+                client.get(url, headers=headers or {})
+
+        threads = [threading.Thread(target=replay, args=(share,)) for share in shares if share]
+        with RssSampler() as sampler:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        results[endpoint] = sampler.result()
+    return results
+
+
+def summarize(recorder, wall_seconds, endpoints=()):
+    # endpoints: reported even when they got no samples at all
+    results = {}
+    for endpoint in sorted(set(recorder.samples) | set(endpoints)):
+        samples = recorder.samples.get(endpoint, [])
+        latencies = [seconds * 1000 for seconds, _, _ in samples]
+        sizes = [size for _, size, _ in samples]
+        results[endpoint] = {
+            'requests': len(samples),
+            'p50_ms': percentile(latencies, 0.50),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'requests_per_sec': len(samples) / wall_seconds if wall_seconds else 0.0,
+            'mean_bytes': sum(sizes) / len(sizes) if sizes else 0.0,
+            'total_bytes': sum(sizes),
+            'status_counts': {str(status): sum(1 for _, _, s in samples if s == status) for status in {s for _, _, s in samples}},
+        }
+    return results
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for endpoint, result in results.items():
+        before = baseline['endpoints'].get(endpoint)
+        if before and result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {result['p95_ms']:.2f} ms vs {before['p95_ms']:.2f} ms in baseline")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the feed API against a mongomock stand-in")
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--image-ratio', type=float, default=0.5, help="share of documents with an image (0 for none)")
+    parser.add_argument('--image-size', type=int, default=128, help="image side in pixels")
+    parser.add_argument('--clients', type=int, default=16, help="concurrent simulated clients")
+    parser.add_argument('--pages', type=int, default=20, help="'load more' pages per client")
+    parser.add_argument('--refreshes', type=int, default=10, help="first-page refreshes per client")
+    parser.add_argument('--pagination', choices=('keyset', 'page', 'both'), default='both')
+    parser.add_argument('--images', action='store_true', help="also fetch the first page's images")
+    parser.add_argument('--sse-subscribers', type=int, default=50)
+    parser.add_argument('--sse-events', type=int, default=10)
+    parser.add_argument('--sse-interval', type=float, default=0.2, help="seconds between inserted documents")
+    parser.add_argument('--no-endpoint-rss', action='store_true', help="skip replaying each endpoint alone to measure its RSS")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--baseline', help="previous results file to compare p95 latency against")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed p95 increase against the baseline")
+    args = parser.parse_args()
+
+    # Seeded before the app starts so the change monitor only reports the SSE phase's inserts
+    phases = {}
+    client = mongomock.MongoClient()
+    started = time.perf_counter()
+    with RssSampler() as sampler:
+        seed_documents(client[DATABASE][Config.FEED_COLLECTION], args.documents, args.image_ratio, args.image_size)
+    phases['seed'] = sampler.result()
+    print(f"Seeded {args.documents} documents in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    app = create_app(
+        {'MONGO_DBNAME': DATABASE, 'START_MONITOR': args.sse_subscribers > 0, 'SSE_BACKEND': 'local',
+         'MONITOR_POLL_INTERVAL': 0.05},
+        mongo_client=client,
+    )
+    rss_before = current_rss_bytes()
+
+    recorder = Recorder()
+    started = time.perf_counter()
+    clients = [
+        threading.Thread(target=simulate_client, args=(app, recorder, args.pages, args.refreshes, args.pagination, args.images))
+        for _ in range(args.clients)
+    ]
+    with RssSampler() as sampler:
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+    phases['clients'] = sampler.result()
+    wall_seconds = time.perf_counter() - started
+    endpoints = summarize(recorder, wall_seconds)
+    if not args.no_endpoint_rss:
+        for endpoint, rss in endpoint_rss(app, recorder, args.clients).items():
+            endpoints[endpoint]['rss'] = rss
+
+    if args.sse_subscribers:
+        sse_recorder = Recorder()
+        started = time.perf_counter()
+        with RssSampler() as sampler:
+            benchmark_sse(app, sse_recorder, args.sse_subscribers, args.sse_events, args.sse_interval)
+        phases['sse'] = sampler.result()
+        # A run where no event arrived still reports sse, with 0 requests against expected
+        endpoints.update(summarize(sse_recorder, time.perf_counter() - started, endpoints=['sse']))
+        endpoints['sse']['expected'] = args.sse_subscribers * args.sse_events
+        endpoints['sse']['rss'] = phases['sse']
+    app.extensions['feed_monitor_stop'].set()
+
+    for endpoint, result in endpoints.items():
+        print(f"{endpoint}: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms, "
+              f"p99 {result['p99_ms']:.2f} ms, {result['mean_bytes']:.0f} B avg", file=sys.stderr)
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'settings': vars(args),
+        'wall_seconds': wall_seconds,
+        # Process-wide; per phase and per endpoint under 'phases' and each endpoint's 'rss'
+        'rss_bytes_before_load': rss_before,
+        'rss_bytes_after_load': current_rss_bytes(),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'phases': phases,
+        'endpoints': endpoints,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(endpoints, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
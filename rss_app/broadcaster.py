@@ -0,0 +1,89 @@
+import json
+import logging
+import queue
+import threading
+from flask import Blueprint, Response, request, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_INTERVAL = 15  # seconds between comment lines that keep idle connections open
+
+
+class Broadcaster:
+    # In-process fan-out: every subscriber gets its own bounded queue, and a
+    # client that falls behind loses its oldest events instead of growing memory
+    def __init__(self, max_queue=100):
+        self.max_queue = max_queue
+        self.subscribers = {}  # queue -> channel
+        self.dropped = 0
+        self.lock = threading.Lock()
+
+    def subscribe(self, channel='sse'):
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self.lock:
+            self.subscribers[subscriber] = channel
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.pop(subscriber, None)
+
+    def publish(self, data, type=None, id=None, retry=None, channel='sse'):
+        # Serialized once, then shared by every subscriber on the channel
+        lines = []
+        if type:
+            lines.append(f'event: {type}')
+        if id is not None:
+            lines.append(f'id: {id}')
+        if retry is not None:
+            lines.append(f'retry: {retry}')
+        lines.extend(f'data: {line}' for line in json.dumps(data).splitlines())
+        message = '\n'.join(lines) + '\n\n'
+
+        with self.lock:
+            subscribers = [subscriber for subscriber, subscribed in self.subscribers.items() if subscribed == channel]
+        for subscriber in subscribers:
+            while True:
+                try:
+                    subscriber.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        subscriber.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def stream(self, channel='sse'):
+        subscriber = self.subscribe(channel)
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+        finally:
+            self.unsubscribe(subscriber)
+
+
+class ServerSentEventsBlueprint(Blueprint):
+    # Drop-in for flask_sse's blueprint (same publish signature) without Redis
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.broadcaster = Broadcaster()
+
+    def publish(self, data, type=None, id=None, retry=None, channel='sse'):
+        self.broadcaster.publish(data, type=type, id=id, retry=retry, channel=channel)
+
+    def stream(self):
+        channel = request.args.get('channel') or 'sse'
+        return Response(
+            stream_with_context(self.broadcaster.stream(channel)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+
+sse = ServerSentEventsBlueprint('sse', __name__)
+sse.add_url_rule('', 'stream', sse.stream)
\ No newline at end of file
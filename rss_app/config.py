@@ -2,4 +2,23 @@ import os
 
 class Config:
     MONGO_URI = os.getenv('MONGO_URI')
-    BOOTSTRAP_SERVE_LOCAL = True
\ No newline at end of file
+    BOOTSTRAP_SERVE_LOCAL = True
+    FEED_COLLECTION = os.getenv('FEED_COLLECTION', 'mydatabase.mycollection')
+    MAX_PAGE_SIZE = 100
+    SEARCH_RECENCY_WEIGHT = float(os.getenv('SEARCH_RECENCY_WEIGHT', 1.0))  # boost for a brand-new document
+    SEARCH_RECENCY_DAYS = float(os.getenv('SEARCH_RECENCY_DAYS', 30))  # age at which the boost has halved
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))  # documents per Mongo batch and per write
+    EXPORT_MAX_BATCH_SIZE = int(os.getenv('EXPORT_MAX_BATCH_SIZE', 10000))  # cap on ?batch_size=, bounds memory per request
+    IMAGE_CACHE_BYTES = int(os.getenv('IMAGE_CACHE_BYTES', 64 * 2 ** 20))
+    HOT_PAGE_TTL = float(os.getenv('HOT_PAGE_TTL', 30))  # seconds; new documents invalidate sooner
+    SSE_BACKEND = os.getenv('SSE_BACKEND', 'local')  # 'local' (in-process) or 'redis' (flask_sse)
+    REDIS_URL = os.getenv('REDIS_URL')
+    START_MONITOR = os.getenv('START_MONITOR', '1').lower() not in ('0', 'false', 'no')
+    MONITOR_STATE_COLLECTION = os.getenv('MONITOR_STATE_COLLECTION', 'monitor_state')
+    MONITOR_POLL_INTERVAL = float(os.getenv('MONITOR_POLL_INTERVAL', 2))
+    FEEDS_FILE = os.getenv('FEEDS_FILE', 'feeds.txt')  # one feed URL per line
+    FEED_STATE_COLLECTION = os.getenv('FEED_STATE_COLLECTION', 'feed_state')
+    FETCH_CONCURRENCY = int(os.getenv('FETCH_CONCURRENCY', 100))
+    FETCH_PER_HOST = int(os.getenv('FETCH_PER_HOST', 4))
+    FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', 20))  # seconds per feed request, counted from when it gets a connection slot
+    FETCH_INTERVAL = float(os.getenv('FETCH_INTERVAL', 300))  # seconds between refresh cycles
\ No newline at end of file
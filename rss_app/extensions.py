@@ -0,0 +1,41 @@
+from flask import current_app
+from flask_pymongo import PyMongo
+from pymongo import DESCENDING, TEXT
+from images import ImageCache
+from page_cache import HotPageCache
+
+mongo = PyMongo()
+image_cache = ImageCache()
+hot_pages = HotPageCache()
+
+# Newest first, with _id breaking ties between documents sharing a datetime
+FEED_SORT = [('datetime', DESCENDING), ('_id', DESCENDING)]
+FEED_INDEX = 'datetime_-1__id_-1'
+CONTENT_HASH_INDEX = 'content_hash_unique'  # dedups items written by fetcher.py
+SEARCH_INDEX = 'title_text_search'
+# Only the fields the feed renders; images are fetched by the browser from /image/<id>
+FEED_PROJECTION = {'title': 1, 'text': 1, 'datetime': 1}
+
+
+def feed_projection():
+    # A fresh dict per query: mongomock rewrites projections in place, which breaks
+    # a shared one under concurrent requests
+    return dict(FEED_PROJECTION)
+
+
+def feed_collection():
+    return mongo.db[current_app.config['FEED_COLLECTION']]
+
+
+def init_caches(app):
+    image_cache.max_bytes = app.config['IMAGE_CACHE_BYTES']
+    hot_pages.ttl = app.config['HOT_PAGE_TTL']
+
+
+def ensure_indexes(collection):
+    # Backs both the sort and the keyset filter in get_documents
+    collection.create_index(FEED_SORT, name=FEED_INDEX)
+    # Sparse so documents inserted before the fetcher existed don't collide on null
+    collection.create_index('content_hash', name=CONTENT_HASH_INDEX, unique=True, sparse=True)
+    # One text index per collection; title matches weigh more than body matches
+    collection.create_index([('title', TEXT), ('text', TEXT)], name=SEARCH_INDEX, weights={'title': 3, 'text': 1})
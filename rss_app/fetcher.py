@@ -0,0 +1,219 @@
+import argparse
+import asyncio
+import hashlib
+import html
+import logging
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import aiohttp
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError
+
+load_dotenv()
+
+from config import Config
+from extensions import ensure_indexes
+
+logger = logging.getLogger(__name__)
+
+# Feed ingestion worker: fetches every feed concurrently, skips unchanged feeds
+# with conditional GET, and bulk inserts new items deduplicated by content hash.
+INSERT_BATCH = 1000
+DUPLICATE_KEY = 11000
+ATOM = '{http://www.w3.org/2005/Atom}'
+TAG_PATTERN = re.compile(r'<[^>]+>')
+
+
+def read_feed_urls(path):
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def plain_text(value):
+    return html.unescape(TAG_PATTERN.sub('', value or '')).strip()
+
+
+def parse_datetime(value):
+    # RSS uses RFC 822 dates, Atom uses RFC 3339; stored as naive UTC like PyMongo returns
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def content_hash(guid, title, text):
+    # Without the feed URL, so an item syndicated into several feeds is stored once
+    key = '\x1f'.join((guid or '', title, text))
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def parse_feed(feed_url, body, fetched_at):
+    root = ET.fromstring(body)
+    items = []
+    for entry in root.iter():
+        if entry.tag == 'item':  # RSS 2.0
+            title = plain_text(entry.findtext('title'))
+            text = plain_text(entry.findtext('description'))
+            link = (entry.findtext('link') or '').strip()
+            guid = entry.findtext('guid') or link
+            published = parse_datetime(entry.findtext('pubDate'))
+        elif entry.tag == f'{ATOM}entry':
+            title = plain_text(entry.findtext(f'{ATOM}title'))
+            text = plain_text(entry.findtext(f'{ATOM}summary') or entry.findtext(f'{ATOM}content'))
+            link_element = entry.find(f'{ATOM}link')
+            link = link_element.get('href', '') if link_element is not None else ''
+            guid = entry.findtext(f'{ATOM}id') or link
+            published = parse_datetime(entry.findtext(f'{ATOM}published') or entry.findtext(f'{ATOM}updated'))
+        else:
+            continue
+        items.append({
+            'title': title,
+            'text': text,
+            'link': link,
+            'feed': feed_url,
+            'datetime': published or fetched_at,
+            'content_hash': content_hash(guid, title, text),
+        })
+    return items
+
+
+async def fetch_feed(session, feed_url, state, timeout=None):
+    # Returns (items, new_state); items is None when the feed hasn't changed
+    headers = {}
+    if state.get('etag'):
+        headers['If-None-Match'] = state['etag']
+    if state.get('last_modified'):
+        headers['If-Modified-Since'] = state['last_modified']
+
+    async with session.get(feed_url, headers=headers, timeout=timeout) as response:
+        if response.status == 304:
+            return None, state
+        response.raise_for_status()
+        body = await response.read()
+        new_state = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            # Servers without validators still get skipped when the body is unchanged
+            'body_hash': hashlib.sha256(body).hexdigest(),
+        }
+    if new_state['body_hash'] == state.get('body_hash'):
+        return None, new_state
+    fetched_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    return parse_feed(feed_url, body, fetched_at), new_state
+
+
+def insert_items(collection, items):
+    # Unordered so one duplicate doesn't stop the rest of the batch
+    if not items:
+        return 0
+    try:
+        return len(collection.insert_many(items, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = [error for error in e.details['writeErrors'] if error['code'] != DUPLICATE_KEY]
+        if errors:
+            raise
+        return e.details['nInserted']
+
+
+async def refresh_feeds(feed_urls, collection, state_collection, concurrency=100, per_host=4, timeout=20):
+    states = {state['_id']: state for state in state_collection.find({'_id': {'$in': feed_urls}})}
+    stats = {'feeds': len(feed_urls), 'unchanged': 0, 'failed': 0, 'items': 0, 'inserted': 0}
+    seen, pending = set(), []
+    # A feed's validators are saved only once every item queued up to it has been
+    # inserted; saved earlier, a failed insert would look unchanged next cycle
+    waiting_states = deque()  # (items queued when the feed was fetched, feed_url, state)
+    counts = {'queued': 0, 'flushed': 0}
+
+    async def flush(force=False):
+        while pending and (force or len(pending) >= INSERT_BATCH):
+            batch = pending[:INSERT_BATCH]
+            del pending[:INSERT_BATCH]
+            stats['inserted'] += await asyncio.to_thread(insert_items, collection, batch)
+            counts['flushed'] += len(batch)
+        while waiting_states and waiting_states[0][0] <= counts['flushed']:
+            _, feed_url, new_state = waiting_states.popleft()
+            await asyncio.to_thread(
+                state_collection.update_one, {'_id': feed_url},
+                {'$set': dict(new_state, fetched_at=datetime.now(timezone.utc).replace(tzinfo=None))}, upsert=True,
+            )
+
+    # Requests wait for a host slot and a global slot before their timeout starts, so
+    # feeds queued behind others on the same host don't time out just from waiting
+    hosts = defaultdict(lambda: asyncio.Semaphore(per_host))
+    slots = asyncio.Semaphore(concurrency)
+    request_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async def fetch(feed_url):
+        try:
+            async with hosts[urlsplit(feed_url).netloc], slots:
+                return feed_url, await fetch_feed(session, feed_url, states.get(feed_url, {}), request_timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError, ET.ParseError) as e:
+            logger.warning("Fetching %s failed: %s", feed_url, e)
+            return feed_url, None
+
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=per_host)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        for task in asyncio.as_completed([fetch(feed_url) for feed_url in feed_urls]):
+            feed_url, result = await task
+            if result is None:
+                stats['failed'] += 1
+                continue
+            items, new_state = result
+            if items is None:
+                stats['unchanged'] += 1
+            else:
+                stats['items'] += len(items)
+                for item in items:
+                    if item['content_hash'] not in seen:
+                        seen.add(item['content_hash'])
+                        pending.append(item)
+                        counts['queued'] += 1
+            waiting_states.append((counts['queued'], feed_url, new_state))
+            await flush()
+    await flush(force=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch RSS/Atom feeds into the feed collection")
+    parser.add_argument('--feeds', default=Config.FEEDS_FILE, help="file with one feed URL per line")
+    parser.add_argument('--mongo-uri', default=Config.MONGO_URI)
+    parser.add_argument('--loop', action='store_true', help=f"refresh every FETCH_INTERVAL ({Config.FETCH_INTERVAL:g}s)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    db = MongoClient(args.mongo_uri).get_default_database()
+    collection = db[Config.FEED_COLLECTION]
+    state_collection = db[Config.FEED_STATE_COLLECTION]
+    ensure_indexes(collection)
+
+    while True:
+        started = time.perf_counter()
+        stats = asyncio.run(refresh_feeds(
+            read_feed_urls(args.feeds), collection, state_collection,
+            concurrency=Config.FETCH_CONCURRENCY, per_host=Config.FETCH_PER_HOST, timeout=Config.FETCH_TIMEOUT,
+        ))
+        logger.info("Refreshed %d feeds in %.1fs: %d unchanged, %d failed, %d items, %d new",
+                    stats['feeds'], time.perf_counter() - started, stats['unchanged'], stats['failed'],
+                    stats['items'], stats['inserted'])
+        if not args.loop:
+            break
+        time.sleep(Config.FETCH_INTERVAL)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+import mongomock
+from aiohttp import web
+
+from extensions import ensure_indexes
+from fetcher import refresh_feeds
+
+# Runs two refresh cycles of the feed fetcher against a local aiohttp stand-in
+# for the feed servers and a mongomock collection, and checks what they did:
+# the first inserts every item once (one item is shared by every feed, so it
+# must be deduplicated), the second finds every feed unchanged through
+# conditional GET. Exits non-zero when a check fails.
+SHARED_TITLE = 'Syndicated everywhere'
+
+
+def feed_body(feed, items):
+    entries = [(f'urn:{feed}:{i}', f'Feed {feed} item {i}', f'Body {i} of feed {feed}') for i in range(items - 1)]
+    entries.append(('urn:shared', SHARED_TITLE, 'Same item in every feed'))
+    return '<?xml version="1.0"?><rss><channel>' + ''.join(
+        f'<item><guid>{guid}</guid><title>{title}</title><description>{text}</description>'
+        f'<pubDate>Mon, 05 Oct 2026 10:00:00 +0000</pubDate></item>'
+        for guid, title, text in entries
+    ) + '</channel></rss>'
+
+
+class StandIn:
+    def __init__(self, items, latency):
+        self.items = items
+        self.latency = latency
+        self.requests = 0
+        self.not_modified = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def handle(self, request):
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+            feed = request.match_info['feed']
+            etag = f'"{feed}-v1"'
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified += 1
+                return web.Response(status=304)
+            return web.Response(text=feed_body(feed, self.items), content_type='application/rss+xml', headers={'ETag': etag})
+        finally:
+            self.active -= 1
+
+
+async def run(args):
+    stand_in = StandIn(args.items, args.latency)
+    app = web.Application()
+    app.router.add_get('/feed/{feed}', stand_in.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    db = mongomock.MongoClient().db
+    collection, state_collection = db.items, db.feed_state
+    ensure_indexes(collection)
+    feed_urls = [f'http://127.0.0.1:{port}/feed/{i}' for i in range(args.feeds)]
+
+    cycles = []
+    try:
+        for _ in range(2):
+            started = time.perf_counter()
+            stats = await refresh_feeds(feed_urls, collection, state_collection, concurrency=args.concurrency,
+                                        per_host=args.per_host, timeout=args.timeout)
+            cycles.append(dict(stats, seconds=time.perf_counter() - started))
+    finally:
+        await runner.cleanup()
+
+    expected = args.feeds * (args.items - 1) + 1
+    checks = {
+        'no_failures': all(cycle['failed'] == 0 for cycle in cycles),
+        'first_cycle_inserts_each_item_once': cycles[0]['inserted'] == expected and collection.count_documents({}) == expected,
+        'shared_item_stored_once': collection.count_documents({'title': SHARED_TITLE}) == 1,
+        'second_cycle_unchanged': cycles[1]['unchanged'] == args.feeds and cycles[1]['inserted'] == 0,
+        'conditional_get_used': stand_in.not_modified == args.feeds,
+        'per_host_limit_respected': stand_in.max_active <= args.per_host,
+    }
+    return {
+        'settings': vars(args),
+        'cycles': cycles,
+        'server': {'requests': stand_in.requests, 'not_modified': stand_in.not_modified, 'max_concurrent': stand_in.max_active},
+        'checks': checks,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the feed fetcher against a local stand-in feed server")
+    parser.add_argument('--feeds', type=int, default=40)
+    parser.add_argument('--items', type=int, default=20, help="items per feed, one of them shared by all feeds")
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds the stand-in takes per response")
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--per-host', type=int, default=2, help="all stand-in feeds share one host")
+    parser.add_argument('--timeout', type=float, default=3, help="seconds per feed request")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    failed = [name for name, passed in report['checks'].items() if not passed]
+    for name in failed:
+        print(f"FAILED {name}", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from PIL import Image, UnidentifiedImageError
+
+# Thumbnails are only made at these widths so the cache stays bounded;
+# other requested widths snap to the next size up
+THUMBNAIL_WIDTHS = (160, 320, 640, 1280)
+IMAGE_MAX_AGE = 86400  # seconds
+
+
+def image_etag(image_data):
+    return hashlib.sha1(image_data.encode()).hexdigest()
+
+
+def decode_image(image_data):
+    # Stored as bare base64, tolerate a data URI prefix too
+    if image_data.startswith('data:'):
+        image_data = image_data.split(',', 1)[1]
+    return base64.b64decode(image_data)
+
+
+def thumbnail_width(width):
+    for size in THUMBNAIL_WIDTHS:
+        if width <= size:
+            return size
+    return THUMBNAIL_WIDTHS[-1]
+
+
+def render_image(data, width=None):
+    # Returns (mimetype, bytes); the original bytes are passed through unless
+    # a thumbnail narrower than the image was asked for
+    try:
+        image = Image.open(io.BytesIO(data))
+    except UnidentifiedImageError:
+        return 'application/octet-stream', data
+    image_format = image.format or 'PNG'
+    if width is None or image.width <= width:
+        return Image.MIME.get(image_format, 'application/octet-stream'), data
+
+    image.thumbnail((width, image.height * width // image.width + 1))
+    if image_format not in ('JPEG', 'PNG', 'GIF', 'WEBP'):
+        image_format = 'PNG'
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = io.BytesIO()
+    image.save(output, format=image_format)
+    return Image.MIME[image_format], output.getvalue()
+
+
+class ImageCache:
+    # LRU of rendered images bounded by total bytes
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, mimetype, data):
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key)[1])
+            self.entries[key] = (mimetype, data)
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
@@ -0,0 +1,51 @@
+import hashlib
+import threading
+import time
+
+
+class HotPageCache:
+    # Serialized first pages and latest document, shared by all requests. The
+    # change monitor advances the (datetime, _id) watermark on every new document,
+    # which drops the entries; the TTL covers edits and deletes it doesn't see.
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self.entries = {}  # key -> (expires_at, body, etag)
+        self.watermark = None
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, body, generation):
+        # Skipped if a new document arrived while the body was being built
+        etag = hashlib.sha1(body).hexdigest()
+        with self.lock:
+            if generation == self.generation:
+                self.entries[key] = (time.monotonic() + self.ttl, body, etag)
+        return etag
+
+    def advance(self, last_datetime, last_id):
+        with self.lock:
+            if self.watermark is not None and (last_datetime, last_id) <= self.watermark:
+                return
+            self.watermark = last_datetime, last_id
+            self.entries.clear()
+            self.generation += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses}
\ No newline at end of file
@@ -0,0 +1,185 @@
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from sqlalchemy import create_engine, event, text, MetaData
+from sqlalchemy.engine import Engine
+from generate_csv import generate_csv_files
+
+# Loader benchmark: times every ingest engine on the same synthetic CSVs, each in
+# its own subprocess against a fresh database, and writes machine-readable results.
+CHUNKSIZE = 10000  # the chunk size both loaders use by default
+
+
+def run_movestuff(directory, database_url, mode, max_workers):
+    import movestuff
+    movestuff.process_csv_files(directory, movestuff.SessionManager(database_url), mode=mode)
+
+
+def run_move2(directory, database_url, mode, max_workers):
+    import move2
+    move2.process_csv_files(directory, move2.SessionManager(database_url), mode=mode, max_workers=max_workers,
+                            chunksize=CHUNKSIZE, resume=False)
+
+
+# name -> (runner, mode); register new ingest engines here
+ENGINES = {
+    'movestuff-orm': (run_movestuff, 'orm'),
+    'movestuff-copy': (run_movestuff, 'copy'),
+    'move2-orm': (run_move2, 'orm'),
+    'move2-copy': (run_move2, 'copy'),
+}
+
+
+def reset_database(database_url):
+    # Throwaway databases only: every table in the target database is dropped
+    engine = create_engine(database_url)
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    metadata.drop_all(bind=engine)
+    engine.dispose()
+
+
+def count_rows(database_url):
+    engine = create_engine(database_url)
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT COUNT(*) FROM locations")).scalar()
+    engine.dispose()
+    return rows
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in KiB on Linux; children covers the worker processes
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_one(engine_name, directory, database_url, max_workers):
+    runner, mode = ENGINES[engine_name]
+    # Shared counter so forked pool workers add their statements to the total
+    queries = multiprocessing.Value('q', 0)
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def count_query(conn, cursor, statement, parameters, context, executemany):
+        with queries.get_lock():
+            queries.value += 1
+
+    started = time.perf_counter()
+    runner(directory, database_url, mode, max_workers)
+    elapsed = time.perf_counter() - started
+
+    csv_rows = {}
+    for name in os.listdir(directory):
+        if name.endswith('.csv'):
+            with open(os.path.join(directory, name)) as f:
+                csv_rows[name] = sum(1 for _ in f) - 1
+    chunks = sum(math.ceil(rows / CHUNKSIZE) for rows in csv_rows.values())
+    rows = count_rows(database_url)
+
+    return {
+        'engine': engine_name,
+        'rows': rows,
+        'expected_rows': sum(csv_rows.values()),
+        'seconds': elapsed,
+        'rows_per_sec': rows / elapsed if elapsed else 0.0,
+        'peak_rss_bytes': peak_rss_bytes(),
+        'queries': queries.value,
+        'queries_per_chunk': queries.value / chunks if chunks else 0.0,
+    }
+
+
+def run_isolated(engine_name, directory, database_url, max_workers):
+    # A subprocess per engine keeps peak RSS and imported state from leaking between runs
+    command = [
+        sys.executable, os.path.abspath(__file__), '--run-one', engine_name,
+        '--csv-dir', directory, '--database-url', database_url,
+    ]
+    if max_workers:
+        command += ['--workers', str(max_workers)]
+    completed = subprocess.run(
+        command, cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    previous = {result['engine']: result for result in baseline['results']}
+    for result in results:
+        before = previous.get(result['engine'])
+        if before and result['rows_per_sec'] < before['rows_per_sec'] * (1 - tolerance):
+            regressions.append(
+                f"{result['engine']}: {result['rows_per_sec']:.0f} rows/sec vs {before['rows_per_sec']:.0f} in baseline"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSV loaders on synthetic data")
+    parser.add_argument('--engines', nargs='+', choices=sorted(ENGINES), default=sorted(ENGINES))
+    parser.add_argument('--csv-dir', help="existing CSV directory; generated into a temp dir when omitted")
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=50000, help="rows per generated file")
+    parser.add_argument('--countries', type=int, default=50)
+    parser.add_argument('--provinces', type=int, default=20, help="provinces per country")
+    parser.add_argument('--database-url', help="throwaway database (all its tables are dropped); temp SQLite when omitted")
+    parser.add_argument('--workers', type=int, help="worker processes for the parallel loader")
+    parser.add_argument('--output', help="write the JSON results to this file")
+    parser.add_argument('--baseline', help="previous results file to compare rows/sec against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed rows/sec drop against the baseline")
+    parser.add_argument('--run-one', choices=sorted(ENGINES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_one:
+        result = run_one(args.run_one, args.csv_dir, args.database_url, args.workers)
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_dir = args.csv_dir
+        if not csv_dir:
+            csv_dir = os.path.join(workdir, 'csv')
+            generate_csv_files(csv_dir, args.files, args.rows, args.countries, args.provinces)
+
+        results = []
+        for engine_name in args.engines:
+            database_url = args.database_url or f"sqlite:///{os.path.join(workdir, engine_name)}.db"
+            reset_database(database_url)
+            result = run_isolated(engine_name, csv_dir, database_url, args.workers)
+            results.append(result)
+            print(f"{engine_name}: {result['rows_per_sec']:.0f} rows/sec, "
+                  f"{result['peak_rss_bytes'] / 2 ** 20:.0f} MiB peak RSS, "
+                  f"{result['queries_per_chunk']:.1f} queries/chunk", file=sys.stderr)
+
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
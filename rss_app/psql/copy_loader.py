@@ -0,0 +1,110 @@
+import io
+from sqlalchemy import text
+from mgrs_grid import GRID_COLUMNS, add_grid_columns
+
+# Staging-table ingest: each chunk is streamed into a staging table with COPY and
+# the countries/provinces/locations are resolved with set-based statements, so the
+# per-row work happens inside the database instead of in Python.
+STAGING_TABLE = 'staging_locations'
+STAGING_COLUMNS = ['country', 'province', 'location', 'mgrs'] + GRID_COLUMNS + ['source_path']
+STAGING_TYPES = {'easting': 'INTEGER', 'northing': 'INTEGER'}
+CSV_COLUMNS = ['Country', 'Province', 'Location', 'MGRS']
+
+
+def is_postgres(connection):
+    return connection.dialect.name == 'postgresql'
+
+
+def create_staging_table(connection):
+    columns = ', '.join(f"{column} {STAGING_TYPES.get(column, 'TEXT')}" for column in STAGING_COLUMNS)
+    if is_postgres(connection):
+        # Unlogged: no WAL for rows that only live for the duration of a chunk
+        connection.execute(text(f'CREATE UNLOGGED TABLE IF NOT EXISTS {STAGING_TABLE} ({columns})'))
+    else:
+        # SQLite fallback: temp tables are private to the connection
+        connection.execute(text(f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ({columns})'))
+
+
+def prepare_staging(session_manager):
+    # Create the shared Postgres staging table once, before any concurrent writers start.
+    # It only ever holds rows inside a chunk's transaction, so an older layout is simply replaced.
+    with session_manager.engine.begin() as connection:
+        if is_postgres(connection):
+            connection.execute(text(f'DROP TABLE IF EXISTS {STAGING_TABLE}'))
+        create_staging_table(connection)
+
+
+def copy_chunk(connection, batch):
+    frame = add_grid_columns(batch)
+    if 'source_path' not in frame:
+        frame = frame.assign(source_path=None)
+    frame = frame[CSV_COLUMNS + GRID_COLUMNS + ['source_path']]
+    if is_postgres(connection):
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+    else:
+        frame = frame.astype(object).where(frame.notna(), None)
+        rows = [dict(zip(STAGING_COLUMNS, row)) for row in frame.itertuples(index=False, name=None)]
+        placeholders = ', '.join(f':{column}' for column in STAGING_COLUMNS)
+        connection.execute(
+            text(f"INSERT INTO {STAGING_TABLE} ({', '.join(STAGING_COLUMNS)}) VALUES ({placeholders})"),
+            rows,
+        )
+
+
+def resolve_staged(connection, with_source=False):
+    # The WHERE clauses also keep SQLite's parser from reading ON CONFLICT as a join constraint
+    connection.execute(text(
+        f"""
+        INSERT INTO countries (country)
+        SELECT DISTINCT country FROM {STAGING_TABLE} WHERE country IS NOT NULL
+        ON CONFLICT (country) DO NOTHING
+        """
+    ))
+    # The province/location unique indexes are dropped during the load, so
+    # provinces are de-duplicated with NOT EXISTS rather than ON CONFLICT
+    connection.execute(text(
+        f"""
+        INSERT INTO provinces (province, country_id)
+        SELECT DISTINCT s.province, c.id
+        FROM {STAGING_TABLE} s
+        JOIN countries c ON c.country = s.country
+        WHERE s.province IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM provinces p
+              WHERE p.province = s.province AND p.country_id = c.id
+          )
+        """
+    ))
+    # source_path only exists on tables created by move2
+    column, value = (', source_path', ', s.source_path') if with_source else ('', '')
+    connection.execute(text(
+        f"""
+        INSERT INTO locations (location, mgrs, province_id, grid_zone, square_id, easting, northing{column})
+        SELECT s.location, s.mgrs, p.id, s.grid_zone, s.square_id, s.easting, s.northing{value}
+        FROM {STAGING_TABLE} s
+        JOIN countries c ON c.country = s.country
+        JOIN provinces p ON p.province = s.province AND p.country_id = c.id
+        """
+    ))
+    connection.execute(text(f'DELETE FROM {STAGING_TABLE}'))
+
+
+# Drop-in replacement for insert_data: one transaction per chunk, so concurrent
+# writers never see each other's staged rows
+def insert_data_copy(batch, session_manager, before_commit=None):
+    with session_manager.engine.begin() as connection:
+        create_staging_table(connection)
+        copy_chunk(connection, batch)
+        resolve_staged(connection, with_source='source_path' in batch)
+        if before_commit:
+            before_commit(connection)
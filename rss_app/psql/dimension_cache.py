@@ -0,0 +1,103 @@
+from sqlalchemy import select
+
+# Run-wide Country/Province key cache. Preloaded with one query per table, then
+# filled in with batched inserts, so that after warm-up every lookup is a dict hit.
+class DimensionCache:
+    def __init__(self, session_manager, batch_size=1000):
+        self.session_manager = session_manager
+        self.batch_size = batch_size
+        self.countries = {}  # country -> id
+        self.provinces = {}  # (country, province) -> id
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def country_table(self):
+        return self.session_manager.Country.__table__
+
+    @property
+    def province_table(self):
+        return self.session_manager.Province.__table__
+
+    def preload(self):
+        countries, provinces = self.country_table, self.province_table
+        with self.session_manager.engine.connect() as connection:
+            self.countries = dict(connection.execute(select(countries.c.country, countries.c.id)).all())
+            rows = connection.execute(
+                select(countries.c.country, provinces.c.province, provinces.c.id)
+                .join_from(provinces, countries, provinces.c.country_id == countries.c.id)
+            ).all()
+        self.provinces = {(country, province): province_id for country, province, province_id in rows}
+        return self
+
+    def _batches(self, items):
+        items = list(items)
+        for start in range(0, len(items), self.batch_size):
+            yield items[start:start + self.batch_size]
+
+    def _insert_returning(self, connection, table, rows, key_columns):
+        # Postgres hands the new IDs back with RETURNING; other dialects select them afterwards
+        columns = [table.c[name] for name in key_columns]
+        if connection.dialect.name == 'postgresql':
+            return connection.execute(table.insert().values(rows).returning(*columns, table.c.id)).all()
+        connection.execute(table.insert(), rows)
+        return self._select_existing(connection, table, rows, key_columns)
+
+    def _select_existing(self, connection, table, rows, key_columns):
+        # Filter each key column with IN and match the exact tuples in Python,
+        # which works on every dialect without row-value support
+        wanted = {tuple(row[name] for name in key_columns) for row in rows}
+        conditions = [table.c[name].in_({key[i] for key in wanted}) for i, name in enumerate(key_columns)]
+        columns = [table.c[name] for name in key_columns]
+        result = connection.execute(select(*columns, table.c.id).where(*conditions)).all()
+        return [row for row in result if tuple(row[:-1]) in wanted]
+
+    def _resolve_countries(self, connection, names):
+        missing = sorted(names - self.countries.keys())
+        for batch in self._batches(missing):
+            rows = [{'country': name} for name in batch]
+            # Another loader may have added some of these since the preload
+            existing = self._select_existing(connection, self.country_table, rows, ['country'])
+            self.countries.update((country, country_id) for country, country_id in existing)
+            rows = [row for row in rows if row['country'] not in self.countries]
+            if rows:
+                inserted = self._insert_returning(connection, self.country_table, rows, ['country'])
+                self.countries.update((country, country_id) for country, country_id in inserted)
+
+    def _resolve_provinces(self, connection, keys):
+        missing = sorted(keys - self.provinces.keys())
+        names = {country_id: country for country, country_id in self.countries.items()}
+        for batch in self._batches(missing):
+            rows = [{'province': province, 'country_id': self.countries[country]} for country, province in batch]
+            existing = self._select_existing(connection, self.province_table, rows, ['province', 'country_id'])
+            self.provinces.update(((names[country_id], province), province_id) for province, country_id, province_id in existing)
+            rows = [row for row in rows if (names[row['country_id']], row['province']) not in self.provinces]
+            if rows:
+                inserted = self._insert_returning(connection, self.province_table, rows, ['province', 'country_id'])
+                self.provinces.update(((names[country_id], province), province_id) for province, country_id, province_id in inserted)
+
+    def resolve(self, keys):
+        keys = set(keys)
+        missing = keys - self.provinces.keys()
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if not missing:
+            return
+        with self.session_manager.engine.begin() as connection:
+            self._resolve_countries(connection, {country for country, _ in missing})
+            self._resolve_provinces(connection, missing)
+
+    def province_ids(self, batch):
+        keys = list(zip(batch['Country'], batch['Province']))
+        self.resolve(keys)
+        return [self.provinces[key] for key in keys]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'countries': len(self.countries),
+            'provinces': len(self.provinces),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
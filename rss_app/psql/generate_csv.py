@@ -0,0 +1,59 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+
+# Synthetic Country/Province/Location/MGRS CSVs for exercising the loaders
+LATITUDE_BANDS = np.array(list('CDEFGHJKLMNPQRSTUVWX'))
+SQUARE_COLUMNS = np.array(list('ABCDEFGHJKLMNPQRSTUVWXYZ'))
+SQUARE_ROWS = np.array(list('ABCDEFGHJKLMNPQRSTUV'))
+
+
+def random_mgrs(rng, size, precision=5):
+    zones = pd.Series(rng.integers(1, 61, size)).astype(str).str.zfill(2)
+    bands = LATITUDE_BANDS[rng.integers(0, len(LATITUDE_BANDS), size)]
+    columns = SQUARE_COLUMNS[rng.integers(0, len(SQUARE_COLUMNS), size)]
+    rows = SQUARE_ROWS[rng.integers(0, len(SQUARE_ROWS), size)]
+    eastings = pd.Series(rng.integers(0, 10 ** precision, size)).astype(str).str.zfill(precision)
+    northings = pd.Series(rng.integers(0, 10 ** precision, size)).astype(str).str.zfill(precision)
+    return (zones + bands + columns + rows + eastings + northings).to_numpy()
+
+
+def generate_frame(rng, rows, countries, provinces_per_country, file_index):
+    country_ids = rng.integers(0, countries, rows)
+    province_ids = rng.integers(0, provinces_per_country, rows)
+    return pd.DataFrame({
+        'Country': pd.Series(country_ids).map(lambda i: f'Country {i}'),
+        'Province': pd.Series(province_ids).map(lambda i: f'Province {i}'),
+        # Unique per file and row so the (location, province) index can be rebuilt after the load
+        'Location': [f'Location {file_index}-{i}' for i in range(rows)],
+        'MGRS': random_mgrs(rng, rows),
+    })
+
+
+def generate_csv_files(directory, files=4, rows_per_file=100000, countries=50, provinces_per_country=20, seed=0):
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for file_index in range(files):
+        path = os.path.join(directory, f'synthetic_{file_index:04d}.csv')
+        generate_frame(rng, rows_per_file, countries, provinces_per_country, file_index).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic location CSVs for the loader benchmarks")
+    parser.add_argument('directory')
+    parser.add_argument('--files', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=100000, help="rows per file")
+    parser.add_argument('--countries', type=int, default=50)
+    parser.add_argument('--provinces', type=int, default=20, help="provinces per country")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_csv_files(args.directory, args.files, args.rows, args.countries, args.provinces, args.seed)
+    print(f"Wrote {len(paths)} files with {args.rows} rows each to {args.directory}")
+
+if __name__ == "__main__":
+    main()
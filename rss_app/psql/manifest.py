@@ -0,0 +1,163 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from sqlalchemy import MetaData, Table, Column, Integer, BigInteger, Float, String, Text, DateTime, inspect, select, func, text
+
+# Load manifest: one row per CSV file (fingerprint + status) and one row per
+# committed chunk. Chunk rows are written in the same transaction as the chunk's
+# data, so after a crash a resumed load picks up exactly where the last commit left off.
+STATUS_LOADING = 'loading'
+STATUS_DONE = 'done'
+STATUS_FAILED = 'failed'
+# Loaded rows carry the file they came from, so a changed file's old rows can be replaced
+SOURCE_INDEX = 'ix_locations_source_path'
+
+metadata = MetaData()
+
+manifest_files = Table(
+    'load_manifest_files', metadata,
+    Column('path', String, primary_key=True),
+    Column('size', BigInteger, nullable=False),
+    Column('mtime', Float, nullable=False),
+    Column('sha256', String(64), nullable=False),
+    Column('status', String(16), nullable=False),
+    Column('rows_loaded', BigInteger, nullable=False, default=0),
+    Column('error', Text),
+    Column('updated_at', DateTime(timezone=True)),
+)
+
+manifest_chunks = Table(
+    'load_manifest_chunks', metadata,
+    Column('path', String, primary_key=True),
+    Column('chunk_index', Integer, primary_key=True),
+    Column('row_offset', BigInteger, nullable=False),
+    Column('rows', Integer, nullable=False),
+    Column('committed_at', DateTime(timezone=True)),
+)
+
+
+def file_hash(path, block_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_path(csv_file):
+    return os.path.abspath(csv_file)
+
+
+def ensure_source_column(engine):
+    # create_all doesn't alter existing tables; rows loaded before this column existed keep NULL
+    existing = {column['name'] for column in inspect(engine).get_columns('locations')}
+    with engine.begin() as connection:
+        if 'source_path' not in existing:
+            connection.execute(text("ALTER TABLE locations ADD COLUMN source_path VARCHAR"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {SOURCE_INDEX} ON locations (source_path)"))
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class LoadManifest:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def create_tables(self):
+        metadata.create_all(self.engine)
+
+    def completed_files(self):
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(manifest_files.c.path, manifest_files.c.size, manifest_files.c.mtime)
+                .where(manifest_files.c.status == STATUS_DONE)
+            ).all()
+        return {path: (size, mtime) for path, size, mtime in rows}
+
+    def pending_files(self, csv_files):
+        # Finished files whose size and mtime are unchanged are skipped without reading them
+        completed = self.completed_files()
+        pending = []
+        for csv_file in csv_files:
+            stat = os.stat(csv_file)
+            if completed.get(os.path.abspath(csv_file)) != (stat.st_size, stat.st_mtime):
+                pending.append(csv_file)
+        return pending
+
+    # Returns (next_chunk_index, row_offset) to load from, or None if the file is already loaded.
+    # discard_rows(connection, path) deletes what an earlier version of the file loaded.
+    def begin_file(self, csv_file, resume=True, discard_rows=None):
+        path = source_path(csv_file)
+        stat = os.stat(csv_file)
+        with self.engine.connect() as connection:
+            row = connection.execute(select(manifest_files).where(manifest_files.c.path == path)).first()
+
+        unchanged = resume and row is not None and (row.size, row.mtime) == (stat.st_size, stat.st_mtime)
+        # Only new or modified-looking files are hashed, outside of any transaction
+        sha256 = None if unchanged else file_hash(csv_file)
+        if not unchanged and resume and row is not None and row.sha256 == sha256:
+            unchanged = True  # Touched but not modified: keep the progress
+
+        with self.engine.begin() as connection:
+            if unchanged:
+                if row.status == STATUS_DONE:
+                    connection.execute(
+                        manifest_files.update().where(manifest_files.c.path == path)
+                        .values(size=stat.st_size, mtime=stat.st_mtime)
+                    )
+                    return None
+                return self._resume_point(connection, path, stat)
+
+            # Starting over from chunk 0: the old rows go in the same transaction as the
+            # old progress, or the reload would duplicate them
+            if discard_rows is not None:
+                discard_rows(connection, path)
+            connection.execute(manifest_chunks.delete().where(manifest_chunks.c.path == path))
+            connection.execute(manifest_files.delete().where(manifest_files.c.path == path))
+            connection.execute(manifest_files.insert().values(
+                path=path, size=stat.st_size, mtime=stat.st_mtime, sha256=sha256,
+                status=STATUS_LOADING, rows_loaded=0, updated_at=_now(),
+            ))
+        return 0, 0
+
+    def _resume_point(self, connection, path, stat):
+        last = connection.execute(
+            select(manifest_chunks.c.chunk_index, manifest_chunks.c.row_offset, manifest_chunks.c.rows)
+            .where(manifest_chunks.c.path == path)
+            .order_by(manifest_chunks.c.chunk_index.desc())
+            .limit(1)
+        ).first()
+        connection.execute(
+            manifest_files.update().where(manifest_files.c.path == path)
+            .values(size=stat.st_size, mtime=stat.st_mtime, status=STATUS_LOADING, error=None, updated_at=_now())
+        )
+        if last is None:
+            return 0, 0
+        return last.chunk_index + 1, last.row_offset + last.rows
+
+    def record_chunk(self, connection, csv_file, chunk_index, row_offset, rows):
+        # Must run on the connection that commits the chunk's data
+        connection.execute(manifest_chunks.insert().values(
+            path=os.path.abspath(csv_file), chunk_index=chunk_index,
+            row_offset=row_offset, rows=rows, committed_at=_now(),
+        ))
+
+    def finish_file(self, csv_file):
+        path = os.path.abspath(csv_file)
+        with self.engine.begin() as connection:
+            rows_loaded = connection.execute(
+                select(func.coalesce(func.sum(manifest_chunks.c.rows), 0)).where(manifest_chunks.c.path == path)
+            ).scalar()
+            connection.execute(
+                manifest_files.update().where(manifest_files.c.path == path)
+                .values(status=STATUS_DONE, rows_loaded=rows_loaded, error=None, updated_at=_now())
+            )
+
+    def fail_file(self, csv_file, error):
+        with self.engine.begin() as connection:
+            connection.execute(
+                manifest_files.update().where(manifest_files.c.path == os.path.abspath(csv_file))
+                .values(status=STATUS_FAILED, error=str(error), updated_at=_now())
+            )
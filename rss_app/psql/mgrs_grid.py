@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, select, bindparam, text
+
+# MGRS strings decoded into numeric grid columns so that square and proximity
+# queries can use the composite (grid_zone, square_id, easting, northing) index.
+GRID_PRECISION = 5  # digits per coordinate kept: 5 = 1 m, 4 = 10 m, ...
+GRID_COLUMNS = ['grid_zone', 'square_id', 'easting', 'northing']
+GRID_INDEX = 'ix_locations_grid'
+SQUARE_SIZE = 100000  # metres per side of a 100 km grid square
+# 100 km square letters: columns by zone number mod 3, rows repeat every 2000 km
+# and start five letters later in even zones
+COLUMN_LETTERS = ('ABCDEFGH', 'JKLMNPQR', 'STUVWXYZ')
+ROW_LETTERS = 'ABCDEFGHJKLMNPQRSTUV'
+BAND_LETTERS = 'CDEFGHJKLMNPQRSTUVWX'
+BAND_HEIGHT = 800000  # metres, latitude bands are 8 degrees (~890 km) tall
+MAX_RADIUS = 8 * SQUARE_SIZE  # a zone is at most eight squares wide
+
+MGRS_PATTERN = r'^(\d{1,2}[C-HJ-NP-X])([A-HJ-NP-Z][A-HJ-NP-V])(\d*)$'
+
+
+def decode_mgrs(values):
+    # Vectorized over the whole series; unparseable references decode to nulls
+    values = pd.Series(values, dtype=object).astype(str).str.upper().str.replace(' ', '', regex=False)
+    parts = values.str.extract(MGRS_PATTERN)
+    digits = parts[2].fillna('')
+    lengths = digits.str.len().to_numpy()
+
+    eastings = np.full(len(values), np.nan)
+    northings = np.full(len(values), np.nan)
+    valid = parts[0].notna().to_numpy() & (lengths % 2 == 0) & (lengths <= 10)
+    # Handle each precision (0-5 digits per coordinate) as one block
+    for length in np.unique(lengths[valid]):
+        mask = valid & (lengths == length)
+        half = length // 2
+        scale = 10 ** (5 - half)
+        if half:
+            block = digits[mask]
+            eastings[mask] = block.str[:half].astype(np.int64).to_numpy() * scale
+            northings[mask] = block.str[half:].astype(np.int64).to_numpy() * scale
+        else:
+            eastings[mask] = northings[mask] = 0
+
+    # Truncate to the stored precision
+    step = 10 ** (5 - GRID_PRECISION)
+    decoded = pd.DataFrame({
+        'grid_zone': parts[0].where(pd.Series(valid, index=values.index)),
+        'square_id': parts[1].where(pd.Series(valid, index=values.index)),
+        'easting': pd.array(np.floor_divide(eastings, step) * step, dtype='Int64'),
+        'northing': pd.array(np.floor_divide(northings, step) * step, dtype='Int64'),
+    }, index=values.index)
+    # zero-pad single-digit zones so '4Q' and '04Q' land in the same grid zone
+    decoded['grid_zone'] = decoded['grid_zone'].str.zfill(3)
+    return decoded
+
+
+def add_grid_columns(batch):
+    if 'grid_zone' in batch:
+        return batch
+    return batch.join(decode_mgrs(batch['MGRS']))
+
+
+def python_values(series):
+    # pandas nulls (NaN/NA) become None and numpy scalars become Python ints for the DB driver
+    return [None if pd.isna(value) else (int(value) if isinstance(value, (np.integer, int)) else value)
+            for value in series.astype(object)]
+
+
+def ensure_grid_columns(engine):
+    # create_all doesn't alter existing tables, so add the columns to older databases here
+    existing = {column['name'] for column in inspect(engine).get_columns('locations')}
+    types = {'grid_zone': 'VARCHAR(3)', 'square_id': 'VARCHAR(2)', 'easting': 'INTEGER', 'northing': 'INTEGER'}
+    with engine.begin() as connection:
+        for name in GRID_COLUMNS:
+            if name not in existing:
+                connection.execute(text(f"ALTER TABLE locations ADD COLUMN {name} {types[name]}"))
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {GRID_INDEX} ON locations (grid_zone, square_id, easting, northing)"
+        ))
+
+
+def backfill_grid_columns(session_manager, batch_size=10000):
+    locations = session_manager.Location.__table__
+    update = (
+        locations.update()
+        .where(locations.c.id == bindparam('location_id'))
+        .values(grid_zone=bindparam('grid_zone'), square_id=bindparam('square_id'),
+                easting=bindparam('easting'), northing=bindparam('northing'))
+    )
+    updated, last_id = 0, 0
+    while True:
+        with session_manager.engine.begin() as connection:
+            rows = connection.execute(
+                select(locations.c.id, locations.c.mgrs)
+                .where(locations.c.grid_zone.is_(None), locations.c.id > last_id)
+                .order_by(locations.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                return updated
+            frame = pd.DataFrame(rows, columns=['id', 'mgrs'])
+            decoded = decode_mgrs(frame['mgrs'])
+            connection.execute(update, [
+                {'location_id': int(location_id), 'grid_zone': zone, 'square_id': square, 'easting': easting, 'northing': northing}
+                for location_id, zone, square, easting, northing in zip(
+                    frame['id'], *(python_values(decoded[name]) for name in GRID_COLUMNS)
+                )
+            ])
+            updated += len(rows)
+            last_id = int(frame['id'].iloc[-1])
+
+
+def _grid_query(session_manager, grid_zones, square_id, min_easting, min_northing, max_easting, max_northing):
+    Location = session_manager.Location
+    return (
+        select(Location)
+        .where(
+            Location.grid_zone.in_(grid_zones),
+            Location.square_id == square_id,
+            Location.easting.between(min_easting, max_easting),
+            Location.northing.between(min_northing, max_northing),
+        )
+    )
+
+
+def locations_in_box(session_manager, grid_zone, square_id, min_easting=0, min_northing=0,
+                     max_easting=SQUARE_SIZE - 1, max_northing=SQUARE_SIZE - 1):
+    # Defaults cover the whole 100 km square
+    session = session_manager.create_session()
+    try:
+        return session.execute(_grid_query(
+            session_manager, [grid_zone.zfill(3)], square_id, min_easting, min_northing, max_easting, max_northing
+        )).scalars().all()
+    finally:
+        session.close()
+
+
+def neighbouring_squares(grid_zone, square_id, easting, northing, radius):
+    # Every 100 km square of the zone that a box of `radius` around the point touches,
+    # as (grid zones, square id, easting offset, northing offset) relative to the point's square.
+    # Squares across a UTM zone boundary can't be found from the letters alone and are skipped.
+    zone, band = int(grid_zone[:-1]), grid_zone[-1]
+    columns = COLUMN_LETTERS[(zone - 1) % 3]
+    row_shift = 5 if zone % 2 == 0 else 0
+    try:
+        column = columns.index(square_id[0])
+        row = ROW_LETTERS.index(square_id[1]) - row_shift
+        band_index = BAND_LETTERS.index(band)
+    except ValueError:
+        raise ValueError(f"Invalid grid square: {grid_zone}{square_id}")
+
+    # Rows only repeat every 2000 km, so the latitude band tells the repeats apart;
+    # a box can reach into neighbouring bands
+    spread = 1 + radius // BAND_HEIGHT
+    bands = BAND_LETTERS[max(band_index - spread, 0):band_index + spread + 1]
+    grid_zones = [f'{zone:02d}{letter}' for letter in bands]
+
+    for d_column in range((easting - radius) // SQUARE_SIZE, (easting + radius) // SQUARE_SIZE + 1):
+        if not 0 <= column + d_column < len(columns):
+            continue
+        for d_row in range((northing - radius) // SQUARE_SIZE, (northing + radius) // SQUARE_SIZE + 1):
+            letters = columns[column + d_column] + ROW_LETTERS[(row + d_row + row_shift) % len(ROW_LETTERS)]
+            yield grid_zones, letters, d_column * SQUARE_SIZE, d_row * SQUARE_SIZE
+
+
+def nearest_locations(session_manager, mgrs, n=10, initial_radius=1000):
+    # Searches a growing window around the point, spilling into the neighbouring
+    # 100 km squares of its UTM zone once the window crosses a square edge
+    target = decode_mgrs([mgrs]).iloc[0]
+    if pd.isna(target['grid_zone']):
+        raise ValueError(f"Invalid MGRS reference: {mgrs!r}")
+    easting, northing = int(target['easting']), int(target['northing'])
+
+    session = session_manager.create_session()
+
+    def fetch(radius):
+        candidates, coordinates = [], []
+        for grid_zones, square_id, x_offset, y_offset in neighbouring_squares(
+                target['grid_zone'], target['square_id'], easting, northing, radius):
+            # The window in the neighbouring square's own coordinates
+            locations = session.execute(_grid_query(
+                session_manager, grid_zones, square_id,
+                easting - radius - x_offset, northing - radius - y_offset,
+                easting + radius - x_offset, northing + radius - y_offset,
+            )).scalars().all()
+            candidates += locations
+            coordinates += [(location.easting + x_offset, location.northing + y_offset) for location in locations]
+        coordinates = np.array(coordinates, dtype=np.float64)
+        distances = np.hypot(coordinates[:, 0] - easting, coordinates[:, 1] - northing) if candidates else np.array([])
+        return candidates, distances
+
+    try:
+        radius = initial_radius
+        candidates, distances = fetch(radius)
+        while len(candidates) < n and radius < MAX_RADIUS:
+            radius *= 4
+            candidates, distances = fetch(radius)
+
+        # The box may hold n points while a closer one sits just outside it, so
+        # widen once to the n-th distance to make the result exact
+        if len(candidates) >= n:
+            kth = np.partition(distances, n - 1)[n - 1]
+            if kth > radius:
+                candidates, distances = fetch(int(np.ceil(kth)))
+
+        order = np.argsort(distances, kind='stable')[:n]
+        return [(candidates[i], float(distances[i])) for i in order]
+    finally:
+        session.close()
@@ -0,0 +1,151 @@
+import queue
+import threading
+from collections import namedtuple
+import pandas as pd
+from copy_loader import CSV_COLUMNS
+from mgrs_grid import add_grid_columns
+
+# Bounded reader -> transformer -> writer pipeline. Parsing the next chunks
+# overlaps with writing the current one, while the queue depth and the memory
+# budget keep the number of chunks in flight bounded on huge files.
+DEFAULT_CHUNKSIZE = 10000
+DEFAULT_QUEUE_DEPTH = 4
+DEFAULT_MAX_MEMORY = 512 * 1024 * 1024  # bytes of parsed chunks in flight per pipeline
+
+_DONE = object()
+
+# Where a chunk sits in its file: rows counts CSV rows read, before any are dropped
+ChunkPosition = namedtuple('ChunkPosition', ['chunk_index', 'row_offset', 'rows'])
+
+
+def read_chunks(csv_file, chunksize=DEFAULT_CHUNKSIZE, **kwargs):
+    # Only the four columns we load, all parsed as plain strings (no type inference)
+    return pd.read_csv(
+        csv_file,
+        usecols=CSV_COLUMNS,
+        dtype={column: str for column in CSV_COLUMNS},
+        chunksize=chunksize,
+        **kwargs,
+    )
+
+
+def normalize_chunk(chunk):
+    # Shared with the dimension scan, so both see the same Country/Province keys
+    return chunk.dropna(subset=CSV_COLUMNS).apply(lambda column: column.str.strip())
+
+
+def transform_chunk(chunk):
+    chunk = normalize_chunk(chunk)
+    # MGRS decoding is CPU work, so it happens here rather than on the writer
+    return add_grid_columns(chunk)
+
+
+class MemoryBudget:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, nbytes, stop_event):
+        with self.condition:
+            # A single chunk larger than the budget is still let through on its own
+            while self.in_flight and self.in_flight + nbytes > self.max_bytes:
+                if stop_event.is_set():
+                    return False
+                self.condition.wait(timeout=0.1)
+            self.in_flight += nbytes
+            return True
+
+    def release(self, nbytes):
+        with self.condition:
+            self.in_flight -= nbytes
+            self.condition.notify_all()
+
+
+def _put(target, item, stop_event):
+    while not stop_event.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(source, stop_event):
+    while not stop_event.is_set():
+        try:
+            return source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+    return _DONE
+
+
+def run_pipeline(csv_file, write_chunk, chunksize=DEFAULT_CHUNKSIZE, queue_depth=DEFAULT_QUEUE_DEPTH,
+                 max_memory=DEFAULT_MAX_MEMORY, transform=transform_chunk, start_chunk=0, start_row=0):
+    parsed = queue.Queue(maxsize=queue_depth)
+    transformed = queue.Queue(maxsize=queue_depth)
+    budget = MemoryBudget(max_memory)
+    stop_event = threading.Event()
+    errors = []
+
+    def reader():
+        chunk_index, row_offset = start_chunk, start_row
+        # Resuming: skip the data rows already loaded but keep the header (row 0)
+        skiprows = (lambda i: 0 < i <= start_row) if start_row else None
+        try:
+            for chunk in read_chunks(csv_file, chunksize, skiprows=skiprows):
+                position = ChunkPosition(chunk_index, row_offset, len(chunk))
+                chunk_index, row_offset = chunk_index + 1, row_offset + len(chunk)
+                nbytes = int(chunk.memory_usage(deep=True).sum())
+                if not budget.acquire(nbytes, stop_event) or not _put(parsed, (chunk, nbytes, position), stop_event):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            _put(parsed, _DONE, stop_event)
+
+    def transformer():
+        try:
+            while True:
+                item = _get(parsed, stop_event)
+                if item is _DONE:
+                    return
+                chunk, nbytes, position = item
+                if not _put(transformed, (transform(chunk), nbytes, position), stop_event):
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop_event.set()
+        finally:
+            _put(transformed, _DONE, stop_event)
+
+    threads = [
+        threading.Thread(target=reader, name='csv-reader', daemon=True),
+        threading.Thread(target=transformer, name='csv-transformer', daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # The writer runs on the calling thread
+    rows = 0
+    try:
+        while True:
+            item = _get(transformed, stop_event)
+            if item is _DONE:
+                break
+            chunk, nbytes, position = item
+            try:
+                write_chunk(chunk, position)
+                rows += len(chunk)
+            finally:
+                budget.release(nbytes)
+    finally:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+    return rows
@@ -1,6 +1,12 @@
-from flask import Blueprint, render_template, jsonify, request
-from pymongo import DESCENDING
-from utils import convert_image, convert_document, JSONEncoder
+import io
+from itertools import islice
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import Blueprint, Response, render_template, jsonify, request, current_app, abort, send_file, stream_with_context
+from utils import convert_document, dumps_json, encode_cursor, keyset_filter, ids_with_images, image_version
+from extensions import feed_collection, feed_projection, hot_pages, image_cache, FEED_SORT
+from search import date_filter, parse_date, search_documents
+from images import IMAGE_MAX_AGE, decode_image, render_image, thumbnail_width
 
 main_bp = Blueprint('main', __name__)
 
@@ -8,33 +14,164 @@ main_bp = Blueprint('main', __name__)
 def index():
     return render_template('index.html')
 
+def hot_response(key, build):
+    # Serves a cached body (or 304) for the pages everyone asks for, only
+    # building it from Mongo after a new document or the TTL drops the entry
+    cached = hot_pages.get(key)
+    if cached is None:
+        generation = hot_pages.generation
+        body = jsonify(build()).get_data()
+        etag = hot_pages.put(key, body, generation)
+    else:
+        body, etag = cached
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True  # always revalidate, the ETag makes that cheap
+    return response.make_conditional(request)
+
+def document_page(query, skip, limit):
+    documents = list(feed_collection().find(query, feed_projection()).sort(FEED_SORT).skip(skip).limit(limit))
+    with_images = ids_with_images(feed_collection(), documents)
+    return [convert_document(doc, doc['_id'] in with_images) for doc in documents]
+
+def keyset_page(query, limit):
+    documents = list(feed_collection().find(query, feed_projection()).sort(FEED_SORT).limit(limit + 1))
+    next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+    documents = documents[:limit]
+    with_images = ids_with_images(feed_collection(), documents)
+    return {
+        'documents': [convert_document(doc, doc['_id'] in with_images) for doc in documents],
+        'next_cursor': next_cursor,
+    }
+
 @main_bp.route('/get_documents')
 def get_documents():
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 10))
-    
-    documents_cursor = mongo.db.mydatabase.mycollection.find().sort('datetime', DESCENDING).skip((page - 1) * limit).limit(limit)
-    documents = [convert_document(doc) for doc in list(documents_cursor)]
-    
-    '''
-    documents = list(documents_cursor)
-
-    for doc in documents:
-        if 'image' in doc:
-            doc['image'] = convert_image(doc['image'])
-    '''
-    return jsonify(documents)
+    limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['MAX_PAGE_SIZE'])
+
+    if 'page' in request.args:
+        # Legacy page mode: deeper pages skip over every earlier document
+        page = max(request.args.get('page', 1, type=int), 1)
+        if page == 1:
+            return hot_response(('page', limit), lambda: document_page({}, 0, limit))
+        return jsonify(document_page({}, (page - 1) * limit, limit))
+
+    # Keyset mode: seek past the last document sent, so every page costs the same
+    if not request.args.get('cursor'):
+        return hot_response(('keyset', limit), lambda: keyset_page({}, limit))
+    try:
+        query = keyset_filter(request.args['cursor'])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(keyset_page(query, limit))
 
 @main_bp.route('/latest_document')
 def latest_document():
-    document = mongo.db.mydatabase.mycollection.find_one(sort=[('datetime', DESCENDING)])
-    if document:
-        document = convert_document(document)
-    
-    '''
-    if document and 'image' in document:
-        document['image'] = convert_image(document['image'])
-    '''
-    return jsonify(document)
-
-app.json_encoder = JSONEncoder
\ No newline at end of file
+    def build():
+        document = feed_collection().find_one({}, feed_projection(), sort=FEED_SORT)
+        if document:
+            document = convert_document(document, bool(ids_with_images(feed_collection(), [document])))
+        return document
+    return hot_response(('latest',), build)
+
+@main_bp.route('/search')
+def search():
+    # ?q= terms ranked by text score and recency, ?from=/&to= ISO dates; without
+    # terms it is a date-range listing on the datetime index, newest first
+    limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['MAX_PAGE_SIZE'])
+    terms = request.args.get('q', '').strip()
+    try:
+        filters = date_filter(
+            parse_date(request.args['from']) if request.args.get('from') else None,
+            parse_date(request.args['to']) if request.args.get('to') else None,
+        )
+        if not terms:
+            query = filters
+            if request.args.get('cursor'):
+                query = {'$and': [filters, keyset_filter(request.args['cursor'])]} if filters else keyset_filter(request.args['cursor'])
+            return jsonify(keyset_page(query, limit))
+        documents, next_cursor = search_documents(
+            feed_collection(), terms, filters, limit, request.args.get('cursor'),
+            recency_weight=current_app.config['SEARCH_RECENCY_WEIGHT'],
+            recency_days=current_app.config['SEARCH_RECENCY_DAYS'],
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with_images = ids_with_images(feed_collection(), documents)
+    return jsonify({
+        'documents': [convert_document(doc, doc['_id'] in with_images) for doc in documents],
+        'next_cursor': next_cursor,
+    })
+
+@main_bp.route('/export_documents')
+def export_documents():
+    # NDJSON, newest first, streamed batch by batch so memory stays flat however
+    # many documents match; ?cursor= resumes after a token from get_documents
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        return jsonify({'error': "limit must be a positive integer"}), 400
+    batch_size = request.args.get('batch_size', type=int) or current_app.config['EXPORT_BATCH_SIZE']
+    batch_size = min(max(batch_size, 1), current_app.config['EXPORT_MAX_BATCH_SIZE'])
+    query = {}
+    if request.args.get('cursor'):
+        try:
+            query = keyset_filter(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    collection = feed_collection()
+    documents_cursor = collection.find(query, feed_projection()).sort(FEED_SORT).batch_size(batch_size)
+    if limit:
+        documents_cursor = documents_cursor.limit(limit)
+
+    def generate():
+        try:
+            while True:
+                batch = list(islice(documents_cursor, batch_size))
+                if not batch:
+                    return
+                with_images = ids_with_images(collection, batch)
+                yield b''.join(dumps_json(convert_document(doc, doc['_id'] in with_images)) + b'\n' for doc in batch)
+        finally:
+            documents_cursor.close()
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@main_bp.route('/image/<document_id>')
+def image(document_id):
+    # ?width= returns a downsized thumbnail; rendered images are kept in an LRU.
+    # Revalidations and cache hits are answered from the stored hash alone.
+    try:
+        document_id = ObjectId(document_id)
+    except InvalidId:
+        abort(404)
+    collection = feed_collection()
+    version, image_data = image_version(collection, document_id)
+    if version is None:
+        abort(404)
+
+    width = request.args.get('width', type=int)
+    width = thumbnail_width(width) if width else None
+    etag = f'{version}-{width or "full"}'
+    if request.if_none_match.contains(etag):
+        # The headers send_file would have sent
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = IMAGE_MAX_AGE
+        return response
+
+    key = (str(document_id), version, width)
+    cached = image_cache.get(key)
+    if cached is None:
+        if image_data is None:
+            document = collection.find_one({'_id': document_id}, {'image': 1})
+            if not document or not document.get('image'):
+                abort(404)
+            image_data = document['image']
+        mimetype, data = render_image(decode_image(image_data), width)
+        image_cache.put(key, mimetype, data)
+    else:
+        mimetype, data = cached
+
+    return send_file(io.BytesIO(data), mimetype=mimetype, etag=etag, max_age=IMAGE_MAX_AGE, conditional=True)
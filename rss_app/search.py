@@ -0,0 +1,105 @@
+import re
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from extensions import feed_projection, FEED_PROJECTION, FEED_SORT
+from utils import decode_token, encode_token
+
+INDEX_NOT_FOUND = 27  # $text without a text index
+DAY_MS = 86400000
+
+
+def parse_date(value):
+    # ISO 8601 date or datetime; compared as naive UTC like the stored datetimes
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def date_filter(since=None, until=None):
+    bounds = {}
+    if since:
+        bounds['$gte'] = since
+    if until:
+        bounds['$lt'] = until
+    return {'datetime': bounds} if bounds else {}
+
+
+def combine(*filters):
+    filters = [f for f in filters if f]
+    if len(filters) > 1:
+        return {'$and': filters}
+    return filters[0] if filters else {}
+
+
+def text_search(collection, terms, filters, limit, token, recency_weight, recency_days):
+    # Text score plus a boost that decays with age; the ranking time is carried in
+    # the token so every page of one search ranks documents the same way
+    if token:
+        mode, now, last_rank, last_id = decode_token(token, (str, datetime, (int, float), ObjectId))
+        if mode != 'text':
+            raise ValueError("Invalid cursor")
+    else:
+        now, last_rank, last_id = datetime.now(timezone.utc).replace(tzinfo=None), None, None
+
+    age_days = {'$divide': [{'$subtract': [now, '$datetime']}, DAY_MS]}
+    pipeline = [
+        {'$match': combine({'$text': {'$search': terms}}, filters)},
+        {'$project': dict(FEED_PROJECTION, score={'$meta': 'textScore'})},
+        {'$addFields': {'rank': {'$add': ['$score', {'$divide': [
+            recency_weight, {'$add': [1, {'$divide': [{'$max': [age_days, 0]}, recency_days]}]},
+        ]}]}}},
+    ]
+    if last_rank is not None:
+        pipeline.append({'$match': {'$or': [
+            {'rank': {'$lt': last_rank}},
+            {'rank': last_rank, '_id': {'$lt': last_id}},
+        ]}})
+    # $sort followed by $limit keeps only the top documents in memory
+    pipeline += [{'$sort': {'rank': -1, '_id': -1}}, {'$limit': limit + 1}]
+
+    documents = list(collection.aggregate(pipeline))
+    next_cursor = None
+    if len(documents) > limit:
+        last = documents[limit - 1]
+        next_cursor = encode_token(['text', now, last['rank'], last['_id']])
+    return documents[:limit], next_cursor
+
+
+def regex_search(collection, terms, filters, limit, token):
+    # For servers without the text index and mongomock-style stand-ins: any term
+    # matching title or text, newest first. Scans, so only a fallback.
+    pattern = '|'.join(re.escape(term) for term in terms.split())
+    query = combine(
+        {'$or': [{'title': {'$regex': pattern, '$options': 'i'}}, {'text': {'$regex': pattern, '$options': 'i'}}]},
+        filters,
+    )
+    if token:
+        mode, last_datetime, last_id = decode_token(token, (str, datetime, ObjectId))
+        if mode != 'regex':
+            raise ValueError("Invalid cursor")
+        query = combine(query, {'$or': [
+            {'datetime': {'$lt': last_datetime}},
+            {'datetime': last_datetime, '_id': {'$lt': last_id}},
+        ]})
+
+    documents = list(collection.find(query, feed_projection()).sort(FEED_SORT).limit(limit + 1))
+    next_cursor = None
+    if len(documents) > limit:
+        last = documents[limit - 1]
+        next_cursor = encode_token(['regex', last['datetime'], last['_id']])
+    return documents[:limit], next_cursor
+
+
+def search_documents(collection, terms, filters, limit, token=None, recency_weight=1.0, recency_days=30):
+    if token and decode_token(token)[0] == 'regex':
+        return regex_search(collection, terms, filters, limit, token)
+    try:
+        return text_search(collection, terms, filters, limit, token, recency_weight, recency_days)
+    except NotImplementedError:
+        pass
+    except OperationFailure as e:
+        if e.code != INDEX_NOT_FOUND:
+            raise
+    return regex_search(collection, terms, filters, limit, token)
@@ -1,17 +1,17 @@
-let currentPage = 1;
+let nextCursor = null;
 const limit = 10;
 
 function renderDocument(document) {
     let html = `
-        <div class="card mb-3 data-id="${document._id}">
+        <div class="card mb-3" data-id="${document._id}">
             <div class="card-body">
                 <h5 class="card-title">${document.title}</h5>
                 <h6 class="card-subtitle mb-2 text-muted">${new Date(document.datetime).toLocaleString()}</h6>
                 <p class="card-text">${document.text}</p>
-                ${document.image ? `<img src="${document.image}" alt="Image" class="img-fluid">` : ''}
+                ${document.image ? `<img src="${document.image}" alt="Image" class="img-fluid" loading="lazy">` : ''}
             </div>
         </div>`;
-    $('#documents').prepend(html);
+    $('#documents').append(html);
 }
 
 function renderDocuments(documents, clear = false) {
@@ -21,16 +21,25 @@ function renderDocuments(documents, clear = false) {
     documents.forEach(doc => renderDocument(doc));
 }
 
-function fetchDocuments(page, limit) {
-    $.getJSON(`/get_documents?page=${page}&limit=${limit}`, function(data) {
-        renderDocuments(data, clear);
+function fetchDocuments(clear = false) {
+    // Without a cursor the server returns the newest page
+    let url = `/get_documents?limit=${limit}`;
+    if (!clear && nextCursor) {
+        url += `&cursor=${encodeURIComponent(nextCursor)}`;
+    }
+    $.getJSON(url, function(data) {
+        renderDocuments(data.documents, clear);
+        nextCursor = data.next_cursor;
+        $('#load-more').toggle(nextCursor !== null);
     });
 }
 
-function checkForNewDocuments() {
-    const firstDocumentId = $('#documents').children().first().attr('data-id');
-    $.getJSON('/latest_document', function(data) {
-        if (data && data._id !== firstDocumentId) {
+function listenForNewDocuments() {
+    // Pushed by the server's change monitor; replaces polling /latest_document
+    const source = new EventSource('/stream');
+    source.addEventListener('new_document', function(event) {
+        const doc = JSON.parse(event.data);
+        if (!$(`#documents [data-id="${doc._id}"]`).length) {
             $('#new-documents-indicator').show();
         }
     });
@@ -38,27 +47,24 @@ function checkForNewDocuments() {
 
 $(document).ready(function() {
     // Initial fetch
-    fetchDocuments(currentPage, limit, true);
+    fetchDocuments(true);
 
     // Load more documents on button click
     $('#load-more').click(function() {
-        currentPage += 1;
-        fetchDocuments(currentPage, limit);
+        fetchDocuments();
     });
 
     // Refresh feed on button click
     $('#refresh-feed').click(function() {
-        fetchDocuments(1, limit, true);
-        currentPage = 1;
+        fetchDocuments(true);
     });
 
     // Refresh now button inside the indicator
     $('#refresh-now').click(function() {
-        fetchDocuments(1, limit, true);
-        currentPage = 1; // Reset the current page to 1
+        fetchDocuments(true);
         $('#new-documents-indicator').hide(); // Hide the indicator after refreshing
     });
 
-    // Periodically check for new documents without refreshing the feed
-    setInterval(checkForNewDocuments, 10000); // Check every 10 seconds
+    // Show the indicator when the server reports new documents
+    listenForNewDocuments();
 });
\ No newline at end of file
@@ -1,18 +1,213 @@
 import base64
-import json
-from bson import json_util
+import binascii
+import logging
+import threading
+from datetime import datetime, timezone
+import orjson
+from bson import json_util, Decimal128, ObjectId
+from flask import current_app, has_request_context, url_for
+from flask.json.provider import JSONProvider
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+from extensions import feed_collection, feed_projection, hot_pages, FEED_SORT
+from images import image_etag
 
-def convert_image(image_data):
-    return "data:image/png;base64," + image_data
+logger = logging.getLogger(__name__)
 
-class JSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        return super(JSONEncoder, self).default(obj)
+# Server can't run change streams (standalone server / no $changeStream support)
+CHANGE_STREAM_UNSUPPORTED = {40573, 115}
+# Saved resume token is too old or unusable; start a fresh stream from now
+CHANGE_STREAM_TOKEN_LOST = {280, 286}
+POLL_BATCH = 100
 
-def convert_document(document):
-    if 'image' in document:
-        document['image'] = convert_image(document['image'])
+# Naive datetimes from PyMongo are UTC; dict keys may be non-strings in aggregation output
+ORJSON_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+
+def json_default(obj):
+    # Only called for types orjson doesn't serialize itself (datetime, UUID, ... are native)
+    if isinstance(obj, (ObjectId, Decimal128)):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_json(obj):
+    return orjson.dumps(obj, default=json_default, option=ORJSON_OPTIONS)
+
+class OrjsonProvider(JSONProvider):
+    # jsonify and request.get_json through orjson, with ObjectId support
+    def dumps(self, obj, **kwargs):
+        return dumps_json(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_json(obj) + b'\n', mimetype='application/json')
+
+def convert_document(document, has_image=False):
+    # Images are served separately by /image/<id>, the document only links to it
     document['_id'] = str(document['_id'])
-    return document
\ No newline at end of file
+    if has_image:
+        # The monitor thread has no request to build URLs from
+        document['image'] = url_for('main.image', document_id=document['_id']) if has_request_context() else f"/image/{document['_id']}"
+    return document
+
+def ids_with_images(collection, documents):
+    # One _id lookup per page instead of pulling every image into the list query
+    ids = [document['_id'] for document in documents]
+    return {document['_id'] for document in collection.find(
+        {'_id': {'$in': ids}, 'image': {'$exists': True, '$nin': [None, '']}}, {'_id': 1}
+    )}
+
+def image_version(collection, document_id):
+    # Returns (hash, image or None). The image's hash is kept next to it from the
+    # first time it is served, so revalidations and cache hits only read the hash;
+    # writers replacing an image must $unset image_hash along with it
+    document = collection.find_one({'_id': document_id}, {'image_hash': 1})
+    if document is None:
+        return None, None
+    if document.get('image_hash'):
+        return document['image_hash'], None
+    document = collection.find_one({'_id': document_id}, {'image': 1})
+    if not document or not document.get('image'):
+        return None, None
+    version = image_etag(document['image'])
+    collection.update_one({'_id': document_id}, {'$set': {'image_hash': version}})
+    return version, document['image']
+
+def encode_token(values):
+    # Opaque continuation token: the sort key of the last document sent
+    payload = json_util.dumps(list(values))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_token(token, types=None):
+    # types: the expected type of each value. Tokens come from clients and their values
+    # go into queries, so anything else (an operator document, say) is rejected.
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        values = json_util.loads(payload)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or not values:
+        raise ValueError("Invalid cursor")
+    if types is not None and (len(values) != len(types) or not all(
+            isinstance(value, expected) and not isinstance(value, bool) for value, expected in zip(values, types))):
+        raise ValueError("Invalid cursor")
+    return values
+
+def encode_cursor(document):
+    return encode_token([document['datetime'], document['_id']])
+
+def decode_cursor(token):
+    last_datetime, last_id = decode_token(token, (datetime, ObjectId))
+    return last_datetime, last_id
+
+def keyset_filter(token):
+    # Everything strictly after the cursor in (datetime desc, _id desc) order
+    last_datetime, last_id = decode_cursor(token)
+    return {'$or': [
+        {'datetime': {'$lt': last_datetime}},
+        {'datetime': last_datetime, '_id': {'$lt': last_id}},
+    ]}
+
+def publish_document(sse, document, has_image):
+    # The feed is ordered by datetime, a document without a real one can't be placed in it
+    if not isinstance(document.get('datetime'), datetime):
+        logger.warning("Not publishing document %s: datetime is %r", document.get('_id'), document.get('datetime'))
+        return
+    hot_pages.advance(document['datetime'], document['_id'])
+    document = convert_document(document, has_image)
+    # ISO 8601 in UTC, as jsonify writes it
+    document['datetime'] = document['datetime'].replace(tzinfo=document['datetime'].tzinfo or timezone.utc).isoformat()
+    sse.publish(document, type='new_document')
+
+def supports_change_streams(collection):
+    # Checked on the class: mongomock's Collection turns unknown attributes into sub-collections
+    return callable(getattr(type(collection), 'watch', None))
+
+def watch_changes(collection, state, sse, stop_event):
+    saved = state.find_one({'_id': collection.name}) or {}
+    pipeline = [
+        {'$match': {'operationType': 'insert'}},
+        # Leave the image behind, only whether there is one
+        {'$project': {
+            'fullDocument._id': 1, 'fullDocument.title': 1, 'fullDocument.text': 1, 'fullDocument.datetime': 1,
+            'fullDocument.has_image': {'$gt': ['$fullDocument.image', None]},
+        }},
+    ]
+    try:
+        stream = collection.watch(pipeline, resume_after=saved.get('resume_token'), max_await_time_ms=1000)
+    except OperationFailure as e:
+        if e.code not in CHANGE_STREAM_TOKEN_LOST or 'resume_token' not in saved:
+            raise
+        logger.warning("Resume token no longer valid, watching from now: %s", e)
+        state.update_one({'_id': collection.name}, {'$unset': {'resume_token': 1}})
+        stream = collection.watch(pipeline, max_await_time_ms=1000)
+
+    with stream:
+        while not stop_event.is_set() and stream.alive:
+            change = stream.try_next()
+            if change is None:
+                continue
+            document = change['fullDocument']
+            publish_document(sse, document, document.pop('has_image', False))
+            state.update_one({'_id': collection.name}, {'$set': {'resume_token': stream.resume_token}}, upsert=True)
+
+def poll_changes(collection, state, sse, stop_event, poll_interval):
+    # Tails the collection on (datetime, _id); documents inserted with a datetime
+    # older than the watermark are not seen, which change streams don't suffer from
+    saved = state.find_one({'_id': collection.name}) or {}
+    if 'last_datetime' in saved:
+        watermark = saved['last_datetime'], saved['last_id']
+    else:
+        newest = collection.find_one({}, {'datetime': 1}, sort=FEED_SORT)
+        watermark = (newest['datetime'], newest['_id']) if newest else None
+        if watermark is not None:
+            # Saved straight away, so a restart after a failed publish resumes from here
+            # instead of from whatever is newest by then
+            state.update_one({'_id': collection.name}, {'$set': {'last_datetime': watermark[0], 'last_id': watermark[1]}}, upsert=True)
+
+    while not stop_event.wait(poll_interval):
+        query = {}
+        if watermark is not None:
+            query = {'$or': [
+                {'datetime': {'$gt': watermark[0]}},
+                {'datetime': watermark[0], '_id': {'$gt': watermark[1]}},
+            ]}
+        documents = list(collection.find(query, feed_projection()).sort([('datetime', ASCENDING), ('_id', ASCENDING)]).limit(POLL_BATCH))
+        if not documents:
+            continue
+        watermark = documents[-1]['datetime'], documents[-1]['_id']
+        with_images = ids_with_images(collection, documents)
+        for document in documents:
+            publish_document(sse, document, document['_id'] in with_images)
+        state.update_one({'_id': collection.name}, {'$set': {'last_datetime': watermark[0], 'last_id': watermark[1]}}, upsert=True)
+
+def monitor_changes(mongo, sse, stop_event=None, retry_interval=5):
+    # Runs until stop_event is set, inside an app context. New feed documents are
+    # pushed to SSE clients from a change stream when the server supports one,
+    # otherwise from polling; progress is saved so a restart doesn't miss or repeat documents
+    stop_event = stop_event or threading.Event()
+    collection = feed_collection()
+    state = mongo.db[current_app.config['MONITOR_STATE_COLLECTION']]
+    poll_interval = current_app.config['MONITOR_POLL_INTERVAL']
+    use_change_stream = supports_change_streams(collection)
+
+    while not stop_event.is_set():
+        try:
+            if use_change_stream:
+                watch_changes(collection, state, sse, stop_event)
+            else:
+                poll_changes(collection, state, sse, stop_event, poll_interval)
+        except OperationFailure as e:
+            if use_change_stream and e.code in CHANGE_STREAM_UNSUPPORTED:
+                logger.info("Change streams unavailable, polling on datetime instead: %s", e)
+                use_change_stream = False
+                continue
+            logger.exception("Change monitor failed, retrying")
+            stop_event.wait(retry_interval)
+        except Exception:
+            # Anything else too (an SSE backend error, ...): a dead monitor thread would
+            # silently stop both the pushes and the hot page invalidation
+            logger.exception("Change monitor failed, retrying")
+            stop_event.wait(retry_interval)
@@ -0,0 +1,91 @@
+import itertools
+import os
+import sqlite3
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+_memory_names = itertools.count()
+
+def apply_sqlite_profile(engine, profile, in_memory=False):
+    pragmas = []
+    if profile.journal_mode and not in_memory:
+        pragmas.append(f'PRAGMA journal_mode={profile.journal_mode}')
+    if profile.synchronous:
+        pragmas.append(f'PRAGMA synchronous={profile.synchronous}')
+    if profile.mmap_size is not None and not in_memory:
+        pragmas.append(f'PRAGMA mmap_size={int(profile.mmap_size)}')
+    if profile.cache_size is not None:
+        pragmas.append(f'PRAGMA cache_size={int(profile.cache_size)}')
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+class MemoryDatabase:
+    # An in-memory copy of a SQLite file that any number of connections can open.
+    # The memdb VFS gives normal file locking (concurrent readers); older SQLite
+    # versions fall back to a shared-cache memory database.
+    def __init__(self, source_path, name=None):
+        self.source_path = source_path
+        name = name or f'memdb_{os.getpid()}_{next(_memory_names)}'
+        if sqlite3.sqlite_version_info >= (3, 36, 0):
+            self.uri = f'file:/{name}?vfs=memdb'
+        else:
+            self.uri = f'file:{name}?mode=memory&cache=shared'
+        self.lock = threading.Lock()
+        self.timer = None
+
+        # The database lives as long as at least one connection to it is open
+        self.keeper = self.connect()
+        source_conn = sqlite3.connect(source_path)
+        source_conn.backup(self.keeper)
+        source_conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+
+    def create_engine(self, pool_size=5, max_overflow=10, **kwargs):
+        return create_engine('sqlite://', creator=self.connect, poolclass=QueuePool,
+                             pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+
+    def write_back(self):
+        with self.lock:
+            if self.keeper is None:
+                return
+            target_conn = sqlite3.connect(self.source_path)
+            try:
+                self.keeper.backup(target_conn)
+            finally:
+                target_conn.close()
+
+    def start_periodic_write_back(self, interval):
+        def run():
+            try:
+                self.write_back()
+            except sqlite3.Error as e:
+                print(f"Write-back of {self.source_path} failed: {e}")
+            self.start_periodic_write_back(interval)
+
+        with self.lock:
+            if self.keeper is None:
+                return
+            self.timer = threading.Timer(interval, run)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def close(self, write_back=False):
+        with self.lock:
+            if self.timer:
+                self.timer.cancel()
+                self.timer = None
+        if write_back:
+            self.write_back()
+        with self.lock:
+            self.keeper.close()
+            self.keeper = None
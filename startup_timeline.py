@@ -0,0 +1,46 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+class StartupTimeline:
+    # Offsets are from `origin`, normally taken as the first thing main.py does,
+    # so the report shows where time-to-first-window goes
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.events = []  # (label, start, end, thread name)
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def measure(self, label):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(label, start, time.perf_counter())
+
+    def record(self, label, start, end):
+        with self.lock:
+            self.events.append((label, start - self.origin, end - self.origin, threading.current_thread().name))
+
+    def mark(self, label):
+        now = time.perf_counter()
+        self.record(label, now, now)
+
+    def to_dict(self):
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event[1])
+        return {'events': [
+            {'label': label, 'start_ms': start * 1000, 'duration_ms': (end - start) * 1000, 'thread': thread}
+            for label, start, end, thread in events
+        ]}
+
+    def to_json(self, **kwargs):
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def report(self):
+        lines = [f"{'start ms':>10} {'took ms':>10}  step"]
+        for event in self.to_dict()['events']:
+            thread = '' if event['thread'] == 'MainThread' else f"  [{event['thread']}]"
+            lines.append(f"{event['start_ms']:>10.1f} {event['duration_ms']:>10.1f}  {event['label']}{thread}")
+        return '\n'.join(lines)
@@ -0,0 +1,234 @@
+import argparse
+import json
+import time
+from datetime import date, datetime
+from sqlalchemy import (
+    create_engine, select, delete, Column, DateTime, Integer, MetaData, String, Table, Text,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import CompileError
+from config import load_config
+from database_manager import DatabaseManager
+
+# Incremental remote -> local SQLite sync for offline mode. Each table keeps a
+# watermark in the local file, so a sync only reads rows past it and upserts them.
+SYNC_STATE_TABLE = '_sync_state'
+UPDATED_COLUMNS = ('updated_at', 'modified_at', 'last_modified', 'last_updated')
+
+sync_metadata = MetaData()
+sync_state = Table(
+    SYNC_STATE_TABLE, sync_metadata,
+    Column('table_name', String, primary_key=True),
+    Column('watermark_column', String),
+    Column('watermark', Text),  # JSON encoded, see encode_watermark
+    Column('rows_synced', Integer),
+    Column('synced_at', DateTime),
+)
+
+
+def encode_watermark(value):
+    if isinstance(value, datetime):
+        return json.dumps({'datetime': value.isoformat()})
+    if isinstance(value, date):
+        return json.dumps({'date': value.isoformat()})
+    return json.dumps(value)
+
+
+def decode_watermark(text):
+    value = json.loads(text)
+    if isinstance(value, dict) and 'datetime' in value:
+        return datetime.fromisoformat(value['datetime'])
+    if isinstance(value, dict) and 'date' in value:
+        return date.fromisoformat(value['date'])
+    return value
+
+
+def local_type(column, dialect):
+    # Postgres-only types (JSONB, UUID, ARRAY, ...) fall back to their generic
+    # form, or to TEXT when SQLite can't render even that
+    for make in (lambda: column.type, column.type.as_generic):
+        try:
+            candidate = make()
+            candidate.compile(dialect=dialect)
+            return candidate
+        except (CompileError, NotImplementedError):
+            pass
+    return Text()
+
+
+def text_value(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def local_table(remote_table, metadata, dialect):
+    # Columns and primary key only: server defaults and foreign keys are the
+    # remote database's business, the local copy just mirrors rows
+    return Table(
+        remote_table.name, metadata,
+        *(Column(column.name, local_type(column, dialect), primary_key=column.primary_key, nullable=column.nullable)
+          for column in remote_table.columns),
+    )
+
+
+def watermark_column(table, override=None):
+    if override:
+        return table.c[override]
+    for name in UPDATED_COLUMNS:
+        if name in table.c and isinstance(table.c[name].type, DateTime):
+            return table.c[name]
+    primary_key = list(table.primary_key.columns)
+    if len(primary_key) == 1 and isinstance(primary_key[0].type, Integer):
+        return primary_key[0]
+    return None
+
+
+def shadow_table(table, local_engine):
+    # Same columns and key as the live table, created empty
+    shadow = Table(
+        f'_sync_new_{table.name}', MetaData(),
+        *(Column(column.name, column.type, primary_key=column.primary_key) for column in table.columns),
+    )
+    shadow.drop(local_engine, checkfirst=True)  # left over from an interrupted sync
+    shadow.create(local_engine)
+    return shadow
+
+
+def sync_table(remote_engine, local_engine, remote_table, table, override=None, batch_size=5000, full=False):
+    column = watermark_column(remote_table, override)
+    primary_key = [c.name for c in table.primary_key.columns]
+    # Tables without a key to upsert on or a watermark to resume from are replaced
+    replace = full or not primary_key or column is None
+
+    watermark = None
+    target = table
+    if replace:
+        # Rows are staged in a shadow table and only swapped in once every batch has
+        # arrived, so a failed or interrupted sync leaves the previous copy intact
+        target = shadow_table(table, local_engine)
+    else:
+        with local_engine.connect() as local:
+            state = local.execute(select(sync_state).where(sync_state.c.table_name == table.name)).first()
+        watermark = decode_watermark(state.watermark) if state and state.watermark else None
+
+    query = select(remote_table)
+    if column is not None:
+        if watermark is not None:
+            # Integer keys only grow, so > is enough; timestamps are re-read from >= to catch
+            # rows committed with the last value, which the upsert makes harmless
+            query = query.where(column > watermark if column.primary_key and isinstance(column.type, Integer) else column >= watermark)
+        query = query.order_by(column)
+
+    if primary_key:
+        upsert = sqlite_insert(target)
+        updates = {c.name: upsert.excluded[c.name] for c in target.columns if c.name not in primary_key}
+        # A table that is all key has nothing to update, an existing row is already current
+        if updates:
+            upsert = upsert.on_conflict_do_update(index_elements=primary_key, set_=updates)
+        else:
+            upsert = upsert.on_conflict_do_nothing(index_elements=primary_key)
+    else:
+        upsert = target.insert()
+
+    # Columns that fell back to TEXT get their values stringified
+    text_columns = [c.name for c in table.columns
+                    if isinstance(c.type, Text) and not isinstance(remote_table.c[c.name].type, (String, Text))]
+
+    rows_synced = 0
+    try:
+        with remote_engine.connect() as remote:
+            # Server-side cursor: one batch in memory at a time
+            result = remote.execution_options(stream_results=True).execute(query)
+            for partition in result.partitions(batch_size):
+                rows = [dict(row._mapping) for row in partition]
+                for row in rows:
+                    for name in text_columns:
+                        row[name] = text_value(row[name])
+                if column is not None:
+                    watermark = rows[-1][column.name]
+                with local_engine.begin() as local:
+                    local.execute(upsert, rows)
+                    if not replace:
+                        # Rows and watermark commit together, so an interrupted sync resumes cleanly
+                        save_state(local, table.name, column, watermark, len(rows))
+                rows_synced += len(rows)
+
+        if replace:
+            with local_engine.begin() as local:
+                local.execute(delete(table))
+                local.execute(table.insert().from_select([c.name for c in table.columns], select(target)))
+                save_state(local, table.name, column, watermark, rows_synced)
+        elif rows_synced == 0:
+            with local_engine.begin() as local:
+                save_state(local, table.name, column, watermark, 0)
+    finally:
+        if replace:
+            target.drop(local_engine, checkfirst=True)
+    return rows_synced
+
+
+def save_state(connection, table_name, column, watermark, rows):
+    values = {
+        'watermark_column': column.name if column is not None else None,
+        'watermark': encode_watermark(watermark) if watermark is not None else None,
+        'synced_at': datetime.utcnow(),
+    }
+    statement = sqlite_insert(sync_state).values(table_name=table_name, rows_synced=rows, **values)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['table_name'],
+        set_=dict(values, rows_synced=sync_state.c.rows_synced + rows),
+    ))
+
+
+def sync_database(db_manager, db_key, batch_size=5000, tables=None, full=False):
+    db_config = db_manager.config.databases[db_key]
+    if not db_config.url or not db_config.path:
+        raise ValueError(f"{db_key!r} needs both a url and a path to sync")
+
+    # Reads go to the replica when there is one
+    remote_url = db_config.read_replica_url or db_config.url
+    remote_engine = create_engine(remote_url, **db_manager.engine_options(remote_url, db_config))
+    local_engine = create_engine(f'sqlite:///{db_config.path}')
+    try:
+        remote_metadata = db_manager.reflect_metadata(remote_engine, remote_url)
+        local_metadata = MetaData()
+        names = tables or db_config.sync_tables or [table.name for table in remote_metadata.sorted_tables]
+        local_tables = [local_table(remote_metadata.tables[name], local_metadata, local_engine.dialect) for name in names]
+        local_metadata.create_all(local_engine)  # only creates missing tables
+        sync_metadata.create_all(local_engine)
+
+        stats = {}
+        for table in local_tables:
+            started = time.perf_counter()
+            rows = sync_table(
+                remote_engine, local_engine, remote_metadata.tables[table.name], table,
+                override=db_config.sync_watermarks.get(table.name), batch_size=batch_size, full=full,
+            )
+            stats[table.name] = rows
+            print(f"{db_key}.{table.name}: {rows} rows in {time.perf_counter() - started:.1f}s")
+        return stats
+    finally:
+        remote_engine.dispose()
+        local_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pull remote tables into the local SQLite databases")
+    parser.add_argument('config', help="config file")
+    parser.add_argument('--databases', nargs='+', help="database keys to sync (default: all with a url and a path)")
+    parser.add_argument('--tables', nargs='+', help="only these tables")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--full', action='store_true', help="ignore watermarks and copy every row again")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    db_manager = DatabaseManager(config)
+    db_keys = args.databases or [key for key, db in config.databases.items() if db.url and db.path]
+    for db_key in db_keys:
+        sync_database(db_manager, db_key, batch_size=args.batch_size, tables=args.tables, full=args.full)
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,12 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTableView
+from sqlalchemy import select
 from database_manager import ExampleTable1
 
 class WidgetA(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db_manager = db_manager
+        self.model = None
         self.init_ui()
 
     def init_ui(self):
@@ -14,15 +16,17 @@ class WidgetA(QWidget):
         button.clicked.connect(self.query_db1)
         layout.addWidget(button)
 
+        self.table_view = QTableView()
+        layout.addWidget(self.table_view)
+
         self.setLayout(layout)
 
     def query_db1(self):
-        session = self.db_manager.get_session('database1')
-        try:
-            result = session.query(ExampleTable1).all()
-            print([r.__dict__ for r in result])
-        except Exception as e:
-            session.rollback()
-            print(f"Error occurred: {e}")
-        finally:
-            session.close()
\ No newline at end of file
+        if self.model:
+            self.model.cancel()
+        # The reflected table carries every column, not just the placeholder model's
+        statement = lambda: select(self.db_manager.get_metadata('database1').tables[ExampleTable1.__tablename__])
+        self.model = self.db_manager.stream_query(
+            'database1', statement, parent=self, on_error=lambda e: print(f"Error occurred: {e}")
+        )
+        self.table_view.setModel(self.model)
@@ -1,10 +1,12 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTableView
+from sqlalchemy import select
 from database_manager import ExampleTable2
 
 class WidgetB(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db_manager = db_manager
+        self.model = None
         self.init_ui()
 
     def init_ui(self):
@@ -14,10 +16,16 @@ class WidgetB(QWidget):
         button.clicked.connect(self.query_db2)
         layout.addWidget(button)
 
+        self.table_view = QTableView()
+        layout.addWidget(self.table_view)
+
         self.setLayout(layout)
 
     def query_db2(self):
-        session = self.db_manager.get_session('database2')
-        result = session.query(ExampleTable2).all()
-        session.close()
-        print([r.__dict__ for r in result])
\ No newline at end of file
+        if self.model:
+            self.model.cancel()
+        statement = lambda: select(self.db_manager.get_metadata('database2').tables[ExampleTable2.__tablename__])
+        self.model = self.db_manager.stream_query(
+            'database2', statement, parent=self, on_error=lambda e: print(f"Error occurred: {e}")
+        )
+        self.table_view.setModel(self.model)